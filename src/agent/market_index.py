@@ -10,6 +10,10 @@ from src.tool import Terminate, ToolCollection
 from src.tool.market_index import MarketIndexTool
 
 
+# Terminate is stateless and can be shared by every agent instance
+_TERMINATE = Terminate()
+
+
 class MarketIndexAgent(MCPAgent):
     """大盘指数分析智能体，专注于分析主要市场指数走势及其对个股的影响"""
 
@@ -23,10 +27,10 @@ class MarketIndexAgent(MCPAgent):
     available_tools: ToolCollection = Field(
         default_factory=lambda: ToolCollection(
             MarketIndexTool(),
-            Terminate(),
+            _TERMINATE,
         )
     )
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
+    special_tool_names: List[str] = Field(default_factory=lambda: [_TERMINATE.name])
 
     async def run(
         self, request: Optional[str] = None, stock_code: Optional[str] = None
@@ -61,7 +61,7 @@ class SentimentAgent(MCPAgent):
     async def analyze(self, stock_code: str, **kwargs) -> Dict:
         """执行舆情分析"""
         try:
-            logger.info(f"开始舆情分析: {stock_code}")
+            logger.info("开始舆情分析: %s", stock_code)
             
             # 确保工具执行 - 添加强制执行逻辑
             analysis_tasks = []
@@ -74,11 +74,11 @@ class SentimentAgent(MCPAgent):
                 })
                 if news_result and news_result.success:
                     analysis_tasks.append(("news_search", news_result.data))
-                    logger.info(f"新闻搜索成功: {stock_code}")
+                    logger.info("新闻搜索成功: %s", stock_code)
                 else:
-                    logger.warning(f"新闻搜索失败: {stock_code}")
+                    logger.warning("新闻搜索失败: %s", stock_code)
             except Exception as e:
-                logger.error(f"新闻搜索异常: {stock_code}, {str(e)}")
+                logger.error("新闻搜索异常: %s, %s", stock_code, e)
             
             # 2. 强制执行社交媒体分析
             try:
@@ -88,11 +88,11 @@ class SentimentAgent(MCPAgent):
                 })
                 if social_result and social_result.success:
                     analysis_tasks.append(("social_media", social_result.data))
-                    logger.info(f"社交媒体分析成功: {stock_code}")
+                    logger.info("社交媒体分析成功: %s", stock_code)
                 else:
-                    logger.warning(f"社交媒体分析失败: {stock_code}")
+                    logger.warning("社交媒体分析失败: %s", stock_code)
             except Exception as e:
-                logger.error(f"社交媒体分析异常: {stock_code}, {str(e)}")
+                logger.error("社交媒体分析异常: %s, %s", stock_code, e)
             
             # 3. 强制执行舆情分析工具
             try:
@@ -102,16 +102,16 @@ class SentimentAgent(MCPAgent):
                 })
                 if sentiment_result and sentiment_result.success:
                     analysis_tasks.append(("sentiment_analysis", sentiment_result.data))
-                    logger.info(f"舆情分析工具成功: {stock_code}")
+                    logger.info("舆情分析工具成功: %s", stock_code)
                 else:
-                    logger.warning(f"舆情分析工具失败: {stock_code}")
+                    logger.warning("舆情分析工具失败: %s", stock_code)
             except Exception as e:
-                logger.error(f"舆情分析工具异常: {stock_code}, {str(e)}")
+                logger.error("舆情分析工具异常: %s, %s", stock_code, e)
             
             # 4. 综合分析结果
             if analysis_tasks:
                 summary = self._generate_comprehensive_summary(analysis_tasks, stock_code)
-                logger.info(f"舆情分析完成: {stock_code}, 执行了 {len(analysis_tasks)} 个任务")
+                logger.info("舆情分析完成: %s, 执行了 %d 个任务", stock_code, len(analysis_tasks))
                 return {
                     "success": True,
                     "analysis_count": len(analysis_tasks),
@@ -119,7 +119,7 @@ class SentimentAgent(MCPAgent):
                     "tasks_executed": [task[0] for task in analysis_tasks]
                 }
             else:
-                logger.warning(f"舆情分析没有成功执行任何任务: {stock_code}")
+                logger.warning("舆情分析没有成功执行任何任务: %s", stock_code)
                 return {
                     "success": False,
                     "analysis_count": 0,
@@ -128,7 +128,7 @@ class SentimentAgent(MCPAgent):
                 }
                 
         except Exception as e:
-            logger.error(f"舆情分析失败: {stock_code}, {str(e)}")
+            logger.error("舆情分析失败: %s, %s", stock_code, e)
             return {
                 "success": False,
                 "error": str(e),
@@ -160,7 +160,7 @@ class SentimentAgent(MCPAgent):
             return "\n".join(summary_parts)
             
         except Exception as e:
-            logger.error(f"生成舆情分析报告失败: {str(e)}")
+            logger.error("生成舆情分析报告失败: %s", e)
             return f"舆情分析报告生成失败: {str(e)}"
     
     def _analyze_news_sentiment(self, data: Dict) -> str:
@@ -124,6 +124,10 @@ class MCPSettings(BaseModel):
     servers: Dict[str, MCPServerConfig] = Field(
         default_factory=dict, description="MCP server configurations"
     )
+    pipeline_init: bool = Field(
+        False,
+        description="Request the tool list concurrently with session initialization",
+    )
 
     @classmethod
     def load_server_config(cls) -> Dict[str, MCPServerConfig]:
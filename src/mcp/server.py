@@ -20,9 +20,6 @@ from src.logger import logger
 from src.tool import BaseTool, Terminate
 
 
-logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(sys.stderr)])
-
-
 class MCPServer:
     """MCP Server implementation with tool registration and management."""
 
@@ -52,7 +49,11 @@ class MCPServer:
             logger.info(f"Executing {tool_name}: {kwargs}")
             result = await tool.execute(**kwargs)
 
-            logger.info(f"Result of {tool_name}: {result}")
+            # Full results can be large market-data payloads; keep them at DEBUG
+            # so the formatting cost is only paid when someone asks for it
+            status = "error" if getattr(result, "error", None) else "ok"
+            logger.info(f"Finished {tool_name}: {status}")
+            logger.debug("Result of {}: {}", tool_name, result)
 
             # Handle different types of results (match original logic)
             if hasattr(result, "model_dump"):
@@ -243,6 +244,10 @@ def parse_args() -> argparse.Namespace:
 
 
 if __name__ == "__main__":
+    # Configure stdlib logging only when running as the server process, so that
+    # importing this module (e.g. from other MCP servers) leaves the host's setup alone
+    logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(sys.stderr)])
+
     args = parse_args()
 
     if args.transport == "sse":
@@ -4,7 +4,7 @@ from typing import Any, Dict, Optional
 from pydantic import BaseModel, Field
 import time
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
 
@@ -98,8 +98,6 @@ def get_recent_trading_day(date_format: str = "%Y-%m-%d") -> str:
     Returns:
         str: 最近的交易日日期字符串
     """
-    from datetime import datetime, timedelta
-    
     current_date = datetime.now()
     
     # 如果是周末，则回退到最近的交易日
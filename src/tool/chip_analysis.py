@@ -10,6 +10,13 @@ import pandas as pd
 
 from src.logger import logger
 from src.tool.base import BaseTool, ToolResult, get_recent_trading_day
+from src.utils.cache import ttl_cache
+
+
+@ttl_cache(seconds=30, cache_if=lambda df: df is not None and not df.empty, copy_result=False)
+def _fetch_a_share_spot() -> pd.DataFrame:
+    """获取沪深京A股全市场实时行情快照（数据量大，短时间内复用同一份结果，调用方不得修改）"""
+    return ak.stock_zh_a_spot_em()
 
 
 class ChipAnalysisTool(BaseTool):
@@ -90,7 +97,7 @@ class ChipAnalysisTool(BaseTool):
             
             # 方法1: 尝试使用原始API - 只获取最近5个交易日
             try:
-                df = ak.stock_cyq_em(symbol=clean_code, adjust=adjust)
+                df = await asyncio.to_thread(ak.stock_cyq_em, symbol=clean_code, adjust=adjust)
                 if df is not None and not df.empty:
                     # 只保留最近5个交易日的数据
                     recent_df = df.tail(5)
@@ -111,29 +118,40 @@ class ChipAnalysisTool(BaseTool):
                 logger.info(f"尝试使用历史行情数据估算筹码分布: {clean_code}")
                 
                 # 使用动态日期范围 - 获取最近10个交易日的数据（保证有足够数据）
-                from datetime import datetime, timedelta
                 recent_trading_day = datetime.strptime(get_recent_trading_day(), "%Y-%m-%d")
                 end_date = recent_trading_day.strftime("%Y%m%d")
                 start_date = (recent_trading_day - timedelta(days=15)).strftime("%Y%m%d")  # 15天前保证有足够交易日
                 
-                hist_df = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                                           start_date=start_date, end_date=end_date, adjust="qfq")
+                hist_df = await asyncio.to_thread(
+                    ak.stock_zh_a_hist, symbol=clean_code, period="daily",
+                    start_date=start_date, end_date=end_date, adjust="qfq"
+                )
                 
                 if hist_df is not None and not hist_df.empty:
                     # 只使用最近5个交易日的数据
                     recent_data = hist_df.tail(5)
                     
-                    # 简单的筹码分布估算
-                    chip_distribution = []
-                    for _, row in recent_data.iterrows():
-                        chip_info = {
-                            "日期": row["日期"],
-                            "价格": row["收盘"],
-                            "成交量": row["成交量"],
-                            "成交额": row["成交额"],
-                            "筹码比例": min(row["换手率"] * 0.1, 10.0) if "换手率" in row else 1.0  # 估算筹码比例
+                    # 简单的筹码分布估算（按列整体取值，避免逐行构造Series）
+                    if "换手率" in recent_data.columns:
+                        chip_ratios = (recent_data["换手率"] * 0.1).clip(upper=10.0).tolist()  # 估算筹码比例
+                    else:
+                        chip_ratios = [1.0] * len(recent_data)
+                    chip_distribution = [
+                        {
+                            "日期": date,
+                            "价格": price,
+                            "成交量": volume,
+                            "成交额": amount,
+                            "筹码比例": ratio,
                         }
-                        chip_distribution.append(chip_info)
+                        for date, price, volume, amount, ratio in zip(
+                            recent_data["日期"].tolist(),
+                            recent_data["收盘"].tolist(),
+                            recent_data["成交量"].tolist(),
+                            recent_data["成交额"].tolist(),
+                            chip_ratios,
+                        )
+                    ]
                     
                     chip_data = {
                         "date": recent_data["日期"].tolist(),
@@ -180,7 +198,7 @@ class ChipAnalysisTool(BaseTool):
             
             # 方法1: 尝试使用实时行情API
             try:
-                stock_info = ak.stock_zh_a_spot_em()
+                stock_info = await asyncio.to_thread(_fetch_a_share_spot)
                 if stock_info is not None and not stock_info.empty:
                     stock_detail = stock_info[stock_info['代码'] == clean_code]
                     
@@ -205,8 +223,10 @@ class ChipAnalysisTool(BaseTool):
                 end_date = recent_trading_day.strftime("%Y%m%d")
                 start_date = (recent_trading_day - timedelta(days=7)).strftime("%Y%m%d")  # 7天前保证有数据
                 
-                hist_df = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                                           start_date=start_date, end_date=end_date, adjust="")
+                hist_df = await asyncio.to_thread(
+                    ak.stock_zh_a_hist, symbol=clean_code, period="daily",
+                    start_date=start_date, end_date=end_date, adjust=""
+                )
                 if hist_df is not None and not hist_df.empty:
                     latest = hist_df.iloc[-1]
                     return {
@@ -250,7 +270,7 @@ class ChipAnalysisTool(BaseTool):
             
             # 1. 尝试东方财富实时数据
             try:
-                realtime_data = ak.stock_zh_a_spot_em()
+                realtime_data = await asyncio.to_thread(_fetch_a_share_spot)
                 if realtime_data is not None and not realtime_data.empty:
                     stock_data = realtime_data[realtime_data['代码'] == clean_code]
                     if not stock_data.empty:
@@ -270,8 +290,10 @@ class ChipAnalysisTool(BaseTool):
                 current_date = recent_trading_day.strftime("%Y%m%d")
                 start_date = (recent_trading_day - timedelta(days=7)).strftime("%Y%m%d")  # 7天前
                 
-                hist_data = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                                             start_date=start_date, end_date=current_date, adjust="")
+                hist_data = await asyncio.to_thread(
+                    ak.stock_zh_a_hist, symbol=clean_code, period="daily",
+                    start_date=start_date, end_date=current_date, adjust=""
+                )
                 if hist_data is not None and not hist_data.empty:
                     latest = hist_data.iloc[-1]
                     data_sources.append({
@@ -287,7 +309,11 @@ class ChipAnalysisTool(BaseTool):
             
             # 3. 尝试获取资金流向数据
             try:
-                money_flow = ak.stock_individual_fund_flow(stock=clean_code, market="sh" if clean_code.startswith('6') else "sz")
+                money_flow = await asyncio.to_thread(
+                    ak.stock_individual_fund_flow,
+                    stock=clean_code,
+                    market="sh" if clean_code.startswith('6') else "sz",
+                )
                 if money_flow is not None and not money_flow.empty:
                     latest_flow = money_flow.iloc[-1]
                     data_sources.append({
@@ -1,10 +1,13 @@
 import json
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import requests
 
+from src.utils.cache import ttl_cache
+
 
 ### 每日热门板块爬取
 
@@ -20,6 +23,10 @@ HEADERS = {
     "Referer": "https://quote.eastmoney.com/",
 }
 
+# 复用连接的会话，避免每次请求都重新建立TCP/TLS连接
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+
 
 def parse_jsonp(jsonp_str):
     import re
@@ -33,7 +40,7 @@ def parse_jsonp(jsonp_str):
 def fetch_data(sector_type, url, max_retries=3, retry_delay=2):
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=15)
+            resp = SESSION.get(url, timeout=15)
             resp.raise_for_status()
             data = parse_jsonp(resp.text)
             if not data:
@@ -67,6 +74,7 @@ def simplify_sector_item(item):
     }
 
 
+@ttl_cache(seconds=60, cache_if=lambda result: result.get("success"))
 def get_all_section(sector_types=None):
     """
     获取所有类型板块数据，包括热门板块、概念板块、行业板块和地域板块
@@ -106,14 +114,16 @@ def get_all_section(sector_types=None):
         if not valid_types:
             return {"success": False, "message": "没有提供有效的板块类型", "data": {}}
 
-        # 获取数据
-        all_data = {}
-        for sector_type in valid_types:
-            url = API_URLS[sector_type]
-            raw_list = fetch_data(sector_type, url)
-            all_data[sector_type] = [
-                simplify_sector_item(item) for item in raw_list if item
-            ]
+        # 获取数据（各板块类型相互独立，并发请求）
+        with ThreadPoolExecutor(max_workers=len(valid_types)) as executor:
+            raw_lists = executor.map(
+                lambda sector_type: fetch_data(sector_type, API_URLS[sector_type]),
+                valid_types,
+            )
+            all_data = {
+                sector_type: [simplify_sector_item(item) for item in raw_list if item]
+                for sector_type, raw_list in zip(valid_types, raw_lists)
+            }
 
         # 准备返回结果
         result = {
@@ -15,6 +15,8 @@ from datetime import datetime
 
 import requests
 
+from src.utils.cache import ttl_cache
+
 
 # API URL - 上证指数(000001)资金流向
 INDEX_CAPITAL_FLOW_URL = "https://push2.eastmoney.com/api/qt/stock/get?invt=2&fltt=1&fields=f135,f136,f137,f138,f139,f140,f141,f142,f143,f144,f145,f146,f147,f148,f149&secid=1.000001&ut=fa5fd1943c7b386f172d6893dbfba10b&wbp2u=|0|0|0|web&dect=1"
@@ -26,6 +28,27 @@ HEADERS = {
     "Accept": "application/json, text/javascript, */*; q=0.01",
 }
 
+# 复用连接的会话，避免每次请求都重新建立TCP/TLS连接
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+
+
+# 默认指数代码和名称映射（映射文件缺失或读取失败时使用）
+DEFAULT_INDEX_CODE_NAME_MAP = {
+    "000001": "上证指数",
+    "399001": "深证成指",
+    "399006": "创业板指",
+    "000300": "沪深300",
+    "000905": "中证500",
+    "000016": "上证50",
+    "000852": "中证1000",
+    "000688": "科创50",
+    "399673": "创业板50",
+}
+
+# 深圳市场指数代码前缀
+SZ_INDEX_PREFIXES = ("39", "1")
+
 
 # 加载指数代码和名称映射
 def load_index_map():
@@ -38,27 +61,11 @@ def load_index_map():
                 return json.load(f)
         else:
             # 如果映射文件不存在，返回默认映射
-            return {
-                "000001": "上证指数",
-                "399001": "深证成指",
-                "399006": "创业板指",
-                "000300": "沪深300",
-                "000905": "中证500",
-                "000016": "上证50",
-                "000852": "中证1000",
-                "000688": "科创50",
-                "399673": "创业板50",
-            }
+            return dict(DEFAULT_INDEX_CODE_NAME_MAP)
     except Exception as e:
         print(f"加载指数映射文件失败: {e}")
         # 返回默认映射
-        return {
-            "000001": "上证指数",
-            "399001": "深证成指",
-            "399006": "创业板指",
-            "000300": "沪深300",
-            "000905": "中证500",
-        }
+        return dict(DEFAULT_INDEX_CODE_NAME_MAP)
 
 
 # 加载指数名称映射
@@ -96,7 +103,7 @@ def fetch_index_capital_flow(index_code="000001", max_retries=3, retry_delay=2):
     """
     # 根据指数代码构建API URL
     market = "1"  # 1:上海 0:深圳
-    if index_code.startswith("39") or index_code.startswith("1"):
+    if index_code.startswith(SZ_INDEX_PREFIXES):
         market = "0"  # 深证指数
 
     url = INDEX_CAPITAL_FLOW_URL.replace(
@@ -113,7 +120,7 @@ def fetch_index_capital_flow(index_code="000001", max_retries=3, retry_delay=2):
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=15)
+            resp = SESSION.get(url, timeout=15)
             resp.raise_for_status()
 
             # 解析响应数据
@@ -198,6 +205,7 @@ def process_flow_data(data, index_code):
     return result
 
 
+@ttl_cache(seconds=30, cache_if=lambda result: result.get("success"))
 def get_index_capital_flow(index_code="000001"):
     """
     获取指数资金流向数据
@@ -36,6 +36,10 @@ HEADERS = {
 
 import requests
 
+# 复用连接的会话，避免每次请求都重新建立TCP/TLS连接
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+
 
 def get_eastmoney_announcements(
     stock_code, page_size=50, page_index=1, max_retries=3, retry_delay=2
@@ -57,7 +61,7 @@ def get_eastmoney_announcements(
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(api_url, params=params, headers=HEADERS, timeout=15)
+            resp = SESSION.get(api_url, params=params, timeout=15)
             resp.raise_for_status()
             data = resp.json()
 
@@ -87,7 +91,7 @@ def get_eastmoney_announcement_detail(art_code, max_retries=3, retry_delay=2):
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(detail_url, params=params, headers=HEADERS, timeout=15)
+            resp = SESSION.get(detail_url, params=params, timeout=15)
             resp.raise_for_status()
             data = resp.json()
 
@@ -161,55 +165,42 @@ def get_announcements_with_detail(stock_code, max_count=30):
 
 
 # 添加财务数据获取函数
-def get_balance_sheet(stock_code, period="按年度"):
-    """获取资产负债表"""
+def _fetch_financial_statement(api_name, report_name, stock_code, period):
+    """调用同花顺财务报表接口，只保留最新的5期数据"""
     if not HAS_AKSHARE:
-        print("未安装akshare库，无法获取资产负债表数据")
+        print(f"未安装akshare库，无法获取{report_name}数据")
         return pd.DataFrame()
 
     try:
-        df = ak.stock_financial_debt_ths(symbol=stock_code, indicator=period)
+        df = getattr(ak, api_name)(symbol=stock_code, indicator=period)
         # 只取前5行数据，通常是最新的
         if isinstance(df, pd.DataFrame) and not df.empty:
             return df.head(5)
         return df
     except Exception as e:
-        print(f"获取资产负债表失败: {e}")
+        print(f"获取{report_name}失败: {e}")
         return pd.DataFrame()
 
 
+def get_balance_sheet(stock_code, period="按年度"):
+    """获取资产负债表"""
+    return _fetch_financial_statement(
+        "stock_financial_debt_ths", "资产负债表", stock_code, period
+    )
+
+
 def get_income_statement(stock_code, period="按年度"):
     """获取利润表"""
-    if not HAS_AKSHARE:
-        print("未安装akshare库，无法获取利润表数据")
-        return pd.DataFrame()
-
-    try:
-        df = ak.stock_financial_benefit_ths(symbol=stock_code, indicator=period)
-        # 只取前5行数据
-        if isinstance(df, pd.DataFrame) and not df.empty:
-            return df.head(5)
-        return df
-    except Exception as e:
-        print(f"获取利润表失败: {e}")
-        return pd.DataFrame()
+    return _fetch_financial_statement(
+        "stock_financial_benefit_ths", "利润表", stock_code, period
+    )
 
 
 def get_cash_flow(stock_code, period="按年度"):
     """获取现金流量表"""
-    if not HAS_AKSHARE:
-        print("未安装akshare库，无法获取现金流量表数据")
-        return pd.DataFrame()
-
-    try:
-        df = ak.stock_financial_cash_ths(symbol=stock_code, indicator=period)
-        # 只取前5行数据
-        if isinstance(df, pd.DataFrame) and not df.empty:
-            return df.head(5)
-        return df
-    except Exception as e:
-        print(f"获取现金流量表失败: {e}")
-        return pd.DataFrame()
+    return _fetch_financial_statement(
+        "stock_financial_cash_ths", "现金流量表", stock_code, period
+    )
 
 
 def get_financial_reports(stock_code, period="按年度"):
@@ -359,10 +350,8 @@ def get_all_stock_codes(csv_path=None):
             print(f"CSV文件缺少必要的列: 股票代码, 股票名称")
             return []
 
-        # 提取股票代码和名称
-        stocks = []
-        for _, row in df.iterrows():
-            stocks.append((row["股票代码"], row["股票名称"]))
+        # 提取股票代码和名称（按列整体读取，避免逐行构造Series）
+        stocks = list(zip(df["股票代码"].tolist(), df["股票名称"].tolist()))
 
         print(f"从CSV文件读取到 {len(stocks)} 只股票")
         return stocks
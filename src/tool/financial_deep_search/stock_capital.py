@@ -14,6 +14,8 @@ from datetime import datetime
 
 import requests
 
+from src.utils.cache import ttl_cache
+
 
 # API URL - 个股资金流向
 STOCK_CAPITAL_FLOW_URL = "https://push2.eastmoney.com/api/qt/clist/get?fid=f62&po=1&pz=50&pn=1&np=1&fltt=2&invt=2&ut=8dec03ba335b81bf4ebdf7b29ec27d15&fs=m%3A0%2Bt%3A6%2Bf%3A!2%2Cm%3A0%2Bt%3A13%2Bf%3A!2%2Cm%3A0%2Bt%3A80%2Bf%3A!2%2Cm%3A1%2Bt%3A2%2Bf%3A!2%2Cm%3A1%2Bt%3A23%2Bf%3A!2%2Cm%3A0%2Bt%3A7%2Bf%3A!2%2Cm%3A1%2Bt%3A3%2Bf%3A!2&fields=f12%2Cf14%2Cf2%2Cf3%2Cf62%2Cf184%2Cf66%2Cf69%2Cf72%2Cf75%2Cf78%2Cf81%2Cf84%2Cf87%2Cf204%2Cf205%2Cf124%2Cf1%2Cf13"
@@ -25,6 +27,10 @@ HEADERS = {
     "Accept": "application/json, text/javascript, */*; q=0.01",
 }
 
+# 复用连接的会话，避免每次请求都重新建立TCP/TLS连接
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+
 
 def parse_jsonp(jsonp_str):
     """解析JSONP响应为JSON数据"""
@@ -43,6 +49,7 @@ def parse_jsonp(jsonp_str):
         return None
 
 
+@ttl_cache(seconds=30, cache_if=lambda result: result is not None)
 def fetch_stock_list_capital_flow(
     page_size=50, page_num=1, max_retries=3, retry_delay=2
 ):
@@ -73,7 +80,7 @@ def fetch_stock_list_capital_flow(
     # 请求数据
     for attempt in range(1, max_retries + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=15)
+            resp = SESSION.get(url, timeout=15)
             resp.raise_for_status()
 
             # 解析响应数据
@@ -127,11 +127,14 @@ class HotMoneyTool(BaseTool):
                     ),
                 }
 
-                # Retrieve each data source
-                for key, func in data_sources.items():
-                    result[key] = await self._get_data_with_retry(
-                        func, key, max_retry, sleep_seconds
+                # Retrieve all data sources concurrently, they are independent
+                fetched = await asyncio.gather(
+                    *(
+                        self._get_data_with_retry(func, key, max_retry, sleep_seconds)
+                        for key, func in data_sources.items()
                     )
+                )
+                result.update(zip(data_sources.keys(), fetched))
 
                 return ToolResult(output=result)
 
@@ -1,28 +1,60 @@
-from typing import Dict, List, Optional, Any
+from typing import ClassVar, Dict, List, Optional, Any, Sequence
 import logging
-import random
 import asyncio
+import copy
+import hashlib
+import time
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
 
-from pydantic import BaseModel, Field
-import sys
-# 优先加载 Conda 环境的 mcp 模块
-sys.path.insert(0, "c:\\Users\\LMT\\.conda\\envs\\FinGenius\\Lib\\site-packages")
-import mcp
-#from mcp import ClientSession, StdioServerParameters
-
-print(sys.path)
-print(mcp.__file__)
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pydantic import BaseModel, ConfigDict, Field
 
 from src.tool.base import BaseTool
 from src.tool.base import ToolResult
-from src.tool.mcp_client import MCPClients
 import json
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 logger = logging.getLogger(__name__)
 
+# 额外MCP服务器配置文件，以及文件不存在时使用的默认配置（安全保守策略）
+_MCP_CONFIG_PATH = (Path(__file__).parent.parent.parent / "config" / "extra_mcp.json").resolve()
+_DEFAULT_MCP_CONFIG = {
+    "enabled": False,
+    "mcpServers": {
+        "mcp_stock": {
+            "enabled": True,
+            "type": "sse",
+            "url": "http://localhost:8000/sse"
+        }
+    }
+}
+
+# 同时返回实时和历史数据的合并MCP工具，服务器提供时可省去一次往返
+_BUNDLE_TOOL_NAME = "get_indices_bundle"
+# 没有合并工具时分别获取实时数据和历史数据的MCP工具
+_REALTIME_TOOL_NAME = "get_index_realtime_data"
+_HISTORY_TOOL_NAME = "get_turnover_history_data"
+
+# 趋势分类结果（趋势, 强度），顺序与 _analyze_trend 中 np.select 的条件一致，最后一项为默认值
+_TREND_LABELS = (("强势上涨", "强"), ("上涨", "中"), ("强势下跌", "强"), ("下跌", "中"), ("震荡", "弱"))
+_PRICE_POSITION_LABELS = ("站上所有均线", "站上短期均线", "跌破所有均线")
+_VOLUME_TREND_LABELS = ("放量", "缩量", "平稳")
+
+# MCP工具调用结果缓存：有效期（秒）和最大条目数
+_MCP_CALL_CACHE_TTL = 30
+_MCP_CALL_CACHE_MAXSIZE = 256
+
+# 分析结果缓存的最大条目数（相同行情数据和参数直接复用分析结果）
+_ANALYSIS_CACHE_MAXSIZE = 64
+
 
 class MarketIndexToolInput(BaseModel):
     """大盘指数分析工具的输入参数"""
@@ -53,6 +85,62 @@ class MarketIndexToolInput(BaseModel):
     )
 
 
+def _json_loads(data):
+    """解析JSON文本，安装了 orjson 时使用其C实现"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_digest(obj: Any) -> bytes:
+    """计算对象规范化JSON序列化结果的摘要，用作缓存键"""
+    if orjson is not None:
+        payload = orjson.dumps(
+            obj,
+            default=str,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    else:
+        payload = json.dumps(obj, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def _create_mcp_clients():
+    """创建MCP客户端；mcp 依赖较重，仅在启用MCP时才导入"""
+    from src.tool.mcp_client import MCPClients
+
+    return MCPClients()
+
+
+# 输入参数的精确类型；调用方传入的参数全部符合时可跳过pydantic完整校验
+_INPUT_FIELD_TYPES = {
+    "index_code": (str, type(None)),
+    "period": (str,),
+    "days": (int,),
+    "analysis_type": (str,),
+    "stock_code": (str, type(None)),
+}
+
+
+class IndexBatch(BaseModel):
+    """多个指数的行情数据按列存储，价格和成交量按末尾对齐堆叠为 (指数数, 天数) 矩阵，缺失位置为 NaN"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    codes: List[str]
+    names: List[str]
+    prices: np.ndarray  # float64，需与保留两位小数的均线精确比较
+    volumes: np.ndarray  # float32
+    change_percent: np.ndarray
+
+    @property
+    def last_prices(self) -> np.ndarray:
+        """各指数最新价格"""
+        if self.prices.shape[1] == 0:
+            return np.full(len(self.codes), np.nan)
+        return self.prices[:, -1]
+
+
 class MarketIndexTool(BaseTool):
     """大盘指数分析工具，用于分析主要市场指数的走势及其对个股的影响"""
     
@@ -61,37 +149,38 @@ class MarketIndexTool(BaseTool):
     input_schema: type = MarketIndexToolInput
     mcp_clients: Any = None
     
-    def __init__(self, **data):
+    # 已解析的MCP配置，所有实例共享，只读取一次配置文件
+    _config_cache: ClassVar[Optional[Dict[str, Any]]] = None
+    
+    def __init__(self, seed: Optional[int] = None, **data):
         super().__init__(**data)
         
-        # 默认配置（安全保守策略）
-        DEFAULT_CONFIG = {
-            "enabled": False,
-            "mcpServers": {
-                "mcp_stock": {
-                    "enabled": True,
-                    "type": "sse",
-                    "url": "http://localhost:8000/sse"
-                }
-            }
-        }
-        
-        # 加载配置（文件不存在时使用默认值）
-        config_path = Path(__file__).parent.parent.parent / "config" / "extra_mcp.json"
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                self._mcp_config = json.load(f)
-        except FileNotFoundError:
-            self._mcp_config = DEFAULT_CONFIG
- 
+        # 模拟行情数据使用的随机数生成器（PCG64，支持批量抽样），需要可复现结果时传入seed
+        self._rng = np.random.default_rng(seed)
+        self._mcp_config = type(self)._load_config()
         self._enabled = self._mcp_config.get("enabled", False)
-        self.mcp_clients = MCPClients() if self._enabled else None
+        self.mcp_clients = _create_mcp_clients() if self._enabled else None
         self._initialized = False
+        self._call_cache: Dict[bytes, tuple] = {}
+        # 合并工具在 tool_map 中注册的名称；None 表示尚未探测，"" 表示服务器不提供
+        self._bundle_tool: Optional[str] = None
+        self._analysis_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
 
         if self._enabled:
             # 避免在已有事件循环中调用asyncio.run()
             asyncio.create_task(self._sync_initialize())
                 
+    @classmethod
+    def _load_config(cls) -> Dict[str, Any]:
+        """加载MCP配置（文件不存在时使用默认值），解析结果在类级别缓存"""
+        if cls._config_cache is None:
+            try:
+                with open(_MCP_CONFIG_PATH, "rb") as f:
+                    cls._config_cache = _json_loads(f.read())
+            except FileNotFoundError:
+                cls._config_cache = _DEFAULT_MCP_CONFIG
+        return cls._config_cache
+    
     async def _sync_initialize(self):
         """同步初始化包装方法"""
         await self.initialize()
@@ -106,7 +195,7 @@ class MarketIndexTool(BaseTool):
         try:
             # 确保 MCP 客户端已创建
             if not hasattr(self, 'mcp_clients') or not self.mcp_clients:
-                self.mcp_clients = MCPClients()
+                self.mcp_clients = _create_mcp_clients()
                 
             # 初始化启用的服务器
             for server_name, server_config in self._mcp_config["mcpServers"].items():
@@ -120,39 +209,176 @@ class MarketIndexTool(BaseTool):
                                 server_config.get("args", [])
                             )
                     except Exception as e:
-                        logger.error(f"连接 MCP 服务器 {server_name} 失败: {str(e)}")
+                        logger.error("连接 MCP 服务器 %s 失败: %s", server_name, e)
                         continue
             
             self._initialized = True
         except Exception as e:
-            logger.error(f"初始化 MCP 客户端失败: {str(e)}")
+            logger.error("初始化 MCP 客户端失败: %s", e)
             self._initialized = False
             raise
     
     async def call_mcp_tool(self, tool_name: str, **kwargs) -> Any:
-        """调用MCP服务器上的工具"""
+        """调用MCP服务器上的工具，相同参数的成功结果在短时间内直接复用
+        
+        工具返回JSON文本时返回解析后的数据，否则返回原始结果
+        """
         if not hasattr(self, "mcp_clients") or not self.mcp_clients:
             raise Exception("MCP客户端未初始化")
+        
+        cache_key = _json_digest([tool_name, kwargs])
+        cached = self._call_cache.get(cache_key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
             
         try:
-            result = await self.mcp_clients.execute(tool_name, kwargs)
-            return result
+            result = await self.mcp_clients.execute(name=tool_name, tool_input=kwargs)
         except Exception as e:
-            logger.error(f"调用MCP工具 {tool_name} 失败: {str(e)}")
+            logger.error("调用MCP工具 %s 失败: %s", tool_name, e)
             raise
+        
+        # 失败结果不缓存
+        if not getattr(result, "error", None):
+            output = getattr(result, "output", None)
+            if isinstance(output, (str, bytes)):
+                try:
+                    result = _json_loads(output)
+                except ValueError:
+                    pass  # 非JSON文本，保留原始结果
+            if cache_key not in self._call_cache and len(self._call_cache) >= _MCP_CALL_CACHE_MAXSIZE:
+                self._call_cache.pop(next(iter(self._call_cache)))
+            self._call_cache[cache_key] = (time.monotonic() + _MCP_CALL_CACHE_TTL, result)
+        return result
     
-    def _process_index_data(self, realtime_data: List[Dict], history_data: List[Dict]) -> Dict[str, Any]:
-        """处理从MCP获取的指数数据，转换为分析所需的格式"""
-        processed_data = {}
+    def _find_mcp_tool(self, tool_name: str) -> Optional[str]:
+        """按服务器端原始工具名查找已连接的MCP工具，返回其在 tool_map 中的注册名（如 mcp_{server_id}_{name}）"""
+        for name, tool in self.mcp_clients.tool_map.items():
+            if name == tool_name or getattr(tool, "original_name", "") == tool_name:
+                return name
+        return None
+    
+    async def _fetch_index_data(self, index_code: Optional[str], start_date: str, end_date: str):
+        """获取实时指数数据和历史成交数据，返回 (realtime_data, history_data)"""
+        # 只探测一次服务器是否提供合并工具
+        if self._bundle_tool is None:
+            self._bundle_tool = self._find_mcp_tool(_BUNDLE_TOOL_NAME) or ""
+        
+        if self._bundle_tool:
+            try:
+                bundle = await self.call_mcp_tool(
+                    self._bundle_tool, codes=index_code, start_date=start_date, end_date=end_date
+                )
+                # 工具调用失败时返回带 error 的结果而不是抛出异常
+                if getattr(bundle, "error", None):
+                    raise RuntimeError(bundle.error)
+                return bundle["realtime"], bundle.get("history", [])
+            except Exception as e:
+                logger.warning("合并工具 %s 调用失败，改为分别获取: %s", _BUNDLE_TOOL_NAME, e)
+        
+        realtime_tool = self._find_mcp_tool(_REALTIME_TOOL_NAME)
+        history_tool = self._find_mcp_tool(_HISTORY_TOOL_NAME)
+        if not realtime_tool or not history_tool:
+            missing = [name for name, tool in ((_REALTIME_TOOL_NAME, realtime_tool), (_HISTORY_TOOL_NAME, history_tool))
+                       if not tool]
+            raise RuntimeError(f"已连接的MCP服务器未提供指数数据工具: {', '.join(missing)}")
+        
+        # 实时指数数据和历史数据相互独立，并发获取
+        realtime_data, history_data = await asyncio.gather(
+            self.call_mcp_tool(realtime_tool, codes=index_code),
+            self.call_mcp_tool(
+                history_tool, 
+                start_date=start_date, 
+                end_date=end_date
+            ),
+            return_exceptions=True,
+        )
+        # 等两个请求都结束后再抛出异常，避免遗留未处理的任务异常；
+        # 工具调用失败时返回带 error 的结果而不是抛出异常
+        for data in (realtime_data, history_data):
+            if isinstance(data, BaseException):
+                raise data
+            if getattr(data, "error", None):
+                raise RuntimeError(data.error)
+        return realtime_data, history_data
+    
+    def _process_index_data(self, realtime_data: List[Dict], history_data: List[Dict],
+                            index_code: Optional[str] = None) -> Dict[str, Any]:
+        """处理从MCP获取的指数数据，转换为与模拟数据相同的分析格式（价格、成交量、技术指标和摘要）"""
+        # 处理历史数据：一次扫描按代码归组。没有代码的记录属于请求的指数；
+        # 未指定指数时视为全市场数据，所有指数共享同一份列表
+        history_by_code: Dict[str, List[Dict]] = defaultdict(list)
+        shared_history: List[Dict] = []
+        for item in history_data:
+            date = item.get("日期")
+            if not date:
+                continue
+            
+            record = {"date": str(date), "turnover": item.get("成交额", 0), "close": item.get("收盘")}
+            code = item.get("代码") or index_code
+            if code:
+                history_by_code[code].append(record)
+            else:
+                shared_history.append(record)
         
-        # 处理实时数据
+        # 处理实时数据，与该指数的历史数据合并为完整的行情序列
+        processed_data = {}
         for item in realtime_data:
             code = item.get("代码")
             if not code:
                 continue
-                
-            processed_data[code] = {
-                "name": item.get("名称", ""),
+            
+            history = sorted(history_by_code.get(code) or shared_history, key=lambda record: record["date"])
+            processed_data[code] = self._build_index_entry(item, history)
+        
+        return processed_data
+    
+    def _build_index_entry(self, item: Dict[str, Any], history: List[Dict]) -> Dict[str, Any]:
+        """由单个指数的实时行情和按日期排序的历史记录构建分析数据
+        
+        价格序列为历史收盘价加上最新价；成交量序列使用成交额，只用于放量/缩量的相对比较，未知时为 None
+        """
+        today = str(item.get("时间") or "")[:10] or datetime.now().strftime("%Y-%m-%d")
+        dates, prices, volumes = [], [], []
+        for record in history:
+            # 当日数据以实时行情为准
+            if record["close"] is None or record["date"] == today:
+                continue
+            dates.append(record["date"])
+            prices.append(float(record["close"]))
+            volumes.append(float(record["turnover"] or 0))
+        
+        # 历史数据不含收盘价时，至少用昨收和最新价构成两天的序列
+        if not prices and item.get("昨收"):
+            dates.append(None)
+            prices.append(float(item["昨收"]))
+            volumes.append(None)
+        
+        dates.append(today)
+        prices.append(float(item.get("最新") or 0))
+        volumes.append(float(item.get("成交额") or 0))
+        
+        moving_averages = self._calculate_moving_averages(prices, (5, 10, 20))
+        return {
+            "name": item.get("名称", ""),
+            "period": "daily",
+            "dates": dates,
+            "prices": prices,
+            "volumes": volumes,
+            "technical_indicators": {
+                "ma5": moving_averages[5],
+                "ma10": moving_averages[10],
+                "ma20": moving_averages[20],
+                "rsi": self._calculate_rsi(prices),
+            },
+            "summary": {
+                "start_price": prices[0],
+                "end_price": prices[-1],
+                "highest": max(prices),
+                "lowest": min(prices),
+                "change_percent": round((prices[-1] - prices[0]) / prices[0] * 100, 2) if prices[0] else 0,
+                "volatility": round(self._calculate_volatility(prices) * 100, 2),
+            },
+            "realtime": {
                 "latest_price": item.get("最新", 0),
                 "change_percent": item.get("涨幅", 0),
                 "high": item.get("最高", 0),
@@ -161,25 +387,9 @@ class MarketIndexTool(BaseTool):
                 "volume": item.get("成交量", 0),
                 "turnover": item.get("成交额", 0),
                 "prev_close": item.get("昨收", 0),
-                "time": item.get("时间", "")
-            }
-        
-        # 处理历史数据
-        for item in history_data:
-            date = item.get("日期")
-            if not date:
-                continue
-                
-            for code, data in processed_data.items():
-                if "history" not in data:
-                    data["history"] = []
-                    
-                data["history"].append({
-                    "date": date,
-                    "turnover": item.get("成交额", 0)
-                })
-        
-        return processed_data
+                "time": item.get("时间", ""),
+            },
+        }
     
     async def execute(self, **kwargs) -> ToolResult:
         """Execute the tool with given parameters."""
@@ -190,7 +400,7 @@ class MarketIndexTool(BaseTool):
                 self._initialized = True
                 
             # 验证输入参数
-            input_params = self.input_schema(**kwargs)
+            input_params = self._parse_input(kwargs)
             
             # 调用 _run 方法
             return await self._run(
@@ -201,9 +411,17 @@ class MarketIndexTool(BaseTool):
                 stock_code=input_params.stock_code
             )
         except Exception as e:
-            logger.error(f"执行工具 {self.name} 失败: {str(e)}")
+            logger.error("执行工具 %s 失败: %s", self.name, e)
             return ToolResult(error=f"执行工具失败: {str(e)}")
 
+    def _parse_input(self, kwargs: Dict[str, Any]) -> MarketIndexToolInput:
+        """解析输入参数；参数名和类型都已正确时直接构造，否则走完整校验（含类型转换和报错）"""
+        if self.input_schema is MarketIndexToolInput and all(
+            type(value) in _INPUT_FIELD_TYPES.get(key, ()) for key, value in kwargs.items()
+        ):
+            return MarketIndexToolInput.model_construct(**kwargs)
+        return self.input_schema(**kwargs)
+
     async def _run(self, index_code: Optional[str] = None, period: str = "daily", 
                   days: int = 30, analysis_type: str = "comprehensive", 
                   stock_code: Optional[str] = None) -> ToolResult:
@@ -220,87 +438,89 @@ class MarketIndexTool(BaseTool):
             包含分析结果的ToolResult对象
         """
         try:
-            logger.info(f"开始分析大盘指数: {index_code or '所有主要指数'}, 周期: {period}, 天数: {days}")
+            logger.info("开始分析大盘指数: %s, 周期: %s, 天数: %s", index_code or '所有主要指数', period, days)
             
-            # 获取实时指数数据
-            realtime_data = await self.call_mcp_tool("get_index_realtime_data", codes=index_code)
+            now = datetime.now()
+            end_date = now.strftime("%Y-%m-%d")
+            start_date = (now - timedelta(days=days)).strftime("%Y-%m-%d")
             
-            # 获取历史数据
-            end_date = datetime.now().strftime("%Y-%m-%d")
-            start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-            history_data = await self.call_mcp_tool(
-                "get_turnover_history_data", 
-                start_date=start_date, 
-                end_date=end_date
-            )
+            realtime_data, history_data = await self._fetch_index_data(index_code, start_date, end_date)
             
             # 处理数据
-            index_data = self._process_index_data(realtime_data, history_data)
+            index_data = self._process_index_data(realtime_data, history_data, index_code)
             
-            # 根据分析类型执行不同的分析
-            if analysis_type == "trend":
-                result = self._analyze_trend(index_data)
-            elif analysis_type == "correlation" and stock_code:
-                result = self._analyze_correlation(index_data, stock_code)
-            else:  # comprehensive
-                result = self._analyze_comprehensive(index_data, stock_code)
+            result = self._analyze_cached(index_data, analysis_type, stock_code)
             
-            logger.info(f"大盘指数分析完成: {index_code or '所有主要指数'}")
+            logger.info("大盘指数分析完成: %s", index_code or '所有主要指数')
             return ToolResult(success=True, data=result)
             
         except Exception as e:
-            logger.error(f"大盘指数分析失败: {str(e)}")
+            logger.error("大盘指数分析失败: %s", e)
             return ToolResult(
                 success=False,
                 error=f"大盘指数分析失败: {str(e)}",
                 data={"error": str(e)}
             )
     
+    def _analyze_cached(self, index_data: Dict[str, Any], analysis_type: str,
+                        stock_code: Optional[str]) -> Dict[str, Any]:
+        """执行分析；行情数据和参数都相同时直接复用最近的分析结果（LRU）
+        
+        只有MCP数据路径会调用此方法；返回结果的副本，调用方修改结果不会影响缓存
+        """
+        cache_key = _json_digest([analysis_type, stock_code, index_data])
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            self._analysis_cache.move_to_end(cache_key)
+            return copy.deepcopy(cached)
+        
+        # 根据分析类型执行不同的分析
+        if analysis_type == "trend":
+            result = self._analyze_trend(index_data)
+        elif analysis_type == "correlation" and stock_code:
+            result = self._analyze_correlation(index_data, stock_code)
+        else:  # comprehensive
+            result = self._analyze_comprehensive(index_data, stock_code)
+        
+        self._analysis_cache[cache_key] = result
+        if len(self._analysis_cache) > _ANALYSIS_CACHE_MAXSIZE:
+            self._analysis_cache.popitem(last=False)
+        return copy.deepcopy(result)
+    
     def _generate_single_index_data(self, index_name: str, period: str, days: int) -> Dict[str, Any]:
         """生成单个指数的模拟数据"""
         # 生成日期序列
-        end_date = datetime.now()
+        end_date = np.datetime64(datetime.now().date())
         if period == "daily":
-            start_date = end_date - timedelta(days=days)
-            date_interval = timedelta(days=1)
+            step_days = 1
         elif period == "weekly":
-            start_date = end_date - timedelta(days=days * 7)
-            date_interval = timedelta(days=7)
+            step_days = 7
         else:  # monthly
-            start_date = end_date - timedelta(days=days * 30)
-            date_interval = timedelta(days=30)
+            step_days = 30
+        start_date = end_date - days * step_days
         
         # 生成价格序列
-        base_price = 3000 + random.randint(-500, 500)  # 基础价格
+        base_price = 3000 + int(self._rng.integers(-500, 501))  # 基础价格
         volatility = 0.01  # 波动率
-        trend = random.choice([-0.0005, 0, 0.0005])  # 趋势
+        trend = float(self._rng.choice(np.array([-0.0005, 0, 0.0005])))  # 趋势
         
-        prices = []
-        volumes = []
-        dates = []
+        # 按周期步长取日期，只保留工作日
+        all_days = np.arange(start_date, end_date + 1, step_days, dtype="datetime64[D]")
+        business_days = all_days[np.is_busday(all_days)]
+        dates = business_days.astype(str).tolist()
+        n_days = len(business_days)
         
-        current_date = start_date
-        current_price = base_price
+        # 一次性生成整条价格路径：每日涨跌幅服从正态分布，价格为累乘结果
+        shocks = self._rng.normal(trend, volatility, n_days)
+        price_path = np.round(base_price * np.cumprod(1.0 + shocks), 2)
+        prices = price_path.tolist()
         
-        while current_date <= end_date:
-            if current_date.weekday() < 5:  # 只考虑工作日
-                dates.append(current_date.strftime("%Y-%m-%d"))
-                
-                # 生成价格
-                change = current_price * (random.normalvariate(trend, volatility))
-                current_price += change
-                prices.append(round(current_price, 2))
-                
-                # 生成成交量
-                volume = int(random.normalvariate(100000000, 20000000))
-                volumes.append(volume)
-            
-            current_date += date_interval
+        # 生成成交量
+        volumes = self._rng.normal(100000000, 20000000, n_days).astype(np.int64).tolist()
         
-        # 计算一些技术指标
-        ma5 = self._calculate_moving_average(prices, 5)
-        ma10 = self._calculate_moving_average(prices, 10)
-        ma20 = self._calculate_moving_average(prices, 20)
+        # 计算一些技术指标（一次调用按各窗口的滑动窗口均值得到三条均线）
+        moving_averages = self._calculate_moving_averages(price_path, (5, 10, 20))
+        ma5, ma10, ma20 = moving_averages[5], moving_averages[10], moving_averages[20]
         
         return {
             "name": index_name,
@@ -312,11 +532,11 @@ class MarketIndexTool(BaseTool):
                 "ma5": ma5,
                 "ma10": ma10,
                 "ma20": ma20,
-                "rsi": round(random.uniform(30, 70), 2),
+                "rsi": round(self._rng.uniform(30, 70), 2),
                 "kdj": {
-                    "k": round(random.uniform(30, 70), 2),
-                    "d": round(random.uniform(30, 70), 2),
-                    "j": round(random.uniform(30, 70), 2),
+                    "k": round(self._rng.uniform(30, 70), 2),
+                    "d": round(self._rng.uniform(30, 70), 2),
+                    "j": round(self._rng.uniform(30, 70), 2),
                 }
             },
             "summary": {
@@ -329,68 +549,126 @@ class MarketIndexTool(BaseTool):
             }
         }
     
-    def _calculate_moving_average(self, prices: List[float], window: int) -> List[float]:
-        """计算移动平均线"""
-        result = []
-        for i in range(len(prices)):
-            if i < window - 1:
-                result.append(None)
+    def _calculate_moving_average(self, prices: List[float], window: int) -> List[Optional[float]]:
+        """计算移动平均线（前 window-1 个位置为 None）"""
+        return self._calculate_moving_averages(prices, (window,))[window]
+    
+    def _calculate_moving_averages(self, prices: Sequence[float], windows: Sequence[int]) -> Dict[int, List[Optional[float]]]:
+        """基于滑动窗口视图一次性计算多条移动平均线，返回 {窗口: 均线序列}
+
+        与 _latest_moving_average 一样按窗口求 mean，保证两处结果（含四舍五入）一致
+        """
+        arr = np.asarray(prices, dtype=np.float64)
+        result = {}
+        for window in windows:
+            if len(arr) < window:
+                result[window] = [None] * len(arr)
             else:
-                window_avg = sum(prices[i-window+1:i+1]) / window
-                result.append(round(window_avg, 2))
+                ma = sliding_window_view(arr, window).mean(axis=1)
+                result[window] = [None] * (window - 1) + np.round(ma, 2).tolist()
         return result
     
+    def _calculate_rsi(self, prices: List[float], window: int = 14) -> Optional[float]:
+        """计算最近 window 个交易日的RSI（简单平均），数据不足两天时为 None"""
+        if len(prices) < 2:
+            return None
+        
+        changes = np.diff(np.asarray(prices[-(window + 1):], dtype=np.float64))
+        gain = changes[changes > 0].sum()
+        loss = -changes[changes < 0].sum()
+        if loss == 0:
+            return 100.0 if gain > 0 else 50.0
+        return round(float(100 - 100 / (1 + gain / loss)), 2)
+    
     def _calculate_volatility(self, prices: List[float]) -> float:
-        """计算价格波动率"""
+        """计算价格波动率（日收益率的总体标准差）"""
         if len(prices) < 2:
             return 0
         
-        returns = [(prices[i] - prices[i-1]) / prices[i-1] for i in range(1, len(prices))]
-        mean_return = sum(returns) / len(returns)
-        squared_deviations = [(r - mean_return) ** 2 for r in returns]
-        variance = sum(squared_deviations) / len(squared_deviations)
-        return variance ** 0.5
+        arr = np.asarray(prices, dtype=np.float64)
+        returns = np.diff(arr) / arr[:-1]
+        return float(returns.std())
+    
+    def _pack_index_data(self, index_data: Dict[str, Any]) -> IndexBatch:
+        """将按指数组织的行情数据转换为按列存储的矩阵，便于对所有指数一次性计算
+        
+        各序列按末尾对齐，较短的序列在前端以 NaN 填充，每个指数的计算结果与单独计算时一致
+        """
+        codes = list(index_data.keys())
+        length = max((len(data["prices"]) for data in index_data.values()), default=0)
+        prices = np.full((len(codes), length), np.nan, dtype=np.float64)
+        # 成交量只用于相对比较（放量/缩量），float32 精度足够且占用减半
+        volumes = np.full((len(codes), length), np.nan, dtype=np.float32)
+        for row, code in enumerate(codes):
+            data = index_data[code]
+            if data["prices"]:
+                prices[row, -len(data["prices"]):] = np.asarray(data["prices"], dtype=np.float64)
+            if data["volumes"]:
+                volumes[row, -len(data["volumes"]):] = np.asarray(data["volumes"], dtype=np.float32)
+        return IndexBatch(
+            codes=codes,
+            names=[index_data[code]["name"] for code in codes],
+            prices=prices,
+            volumes=volumes,
+            change_percent=np.array([index_data[code]["summary"]["change_percent"] for code in codes], dtype=np.float64),
+        )
+    
+    def _latest_moving_average(self, prices: np.ndarray, window: int) -> np.ndarray:
+        """计算每个指数最新一天的移动平均值，数据不足（窗口内含填充的 NaN）时为 NaN"""
+        if prices.shape[1] < window:
+            return np.full(prices.shape[0], np.nan)
+        return np.round(prices[:, -window:].mean(axis=1), 2)
     
     def _analyze_trend(self, index_data: Dict[str, Any]) -> Dict[str, Any]:
         """分析指数趋势"""
         results = {}
         
-        for code, data in index_data.items():
-            prices = data["prices"]
-            ma5 = data["technical_indicators"]["ma5"]
-            ma10 = data["technical_indicators"]["ma10"]
-            ma20 = data["technical_indicators"]["ma20"]
-            
-            # 判断趋势
-            if prices[-1] > ma5[-1] > ma10[-1] > ma20[-1]:
-                trend = "强势上涨"
-                strength = "强"
-            elif prices[-1] > ma5[-1] and ma5[-1] > ma10[-1]:
-                trend = "上涨"
-                strength = "中"
-            elif prices[-1] < ma5[-1] < ma10[-1] < ma20[-1]:
-                trend = "强势下跌"
-                strength = "强"
-            elif prices[-1] < ma5[-1] and ma5[-1] < ma10[-1]:
-                trend = "下跌"
-                strength = "中"
-            else:
-                trend = "震荡"
-                strength = "弱"
+        # 对所有指数一次性计算最新价格和均线
+        batch = self._pack_index_data(index_data)
+        last_prices = batch.last_prices
+        ma5_last = self._latest_moving_average(batch.prices, 5)
+        ma10_last = self._latest_moving_average(batch.prices, 10)
+        ma20_last = self._latest_moving_average(batch.prices, 20)
+        
+        # 对所有指数一次性判断趋势（均线缺失时比较结果为False，归为震荡）
+        up = (last_prices > ma5_last) & (ma5_last > ma10_last)
+        down = (last_prices < ma5_last) & (ma5_last < ma10_last)
+        trend_codes = np.select(
+            [up & (ma10_last > ma20_last), up, down & (ma10_last < ma20_last), down],
+            [0, 1, 2, 3],
+            default=len(_TREND_LABELS) - 1,
+        )
+        position_codes = np.select(
+            [last_prices > ma20_last, last_prices > ma5_last], [0, 1], default=2
+        )
+        
+        # 最新成交量与此前5日均量比较（均量只计算一次；与逐个计算一样，不足5日时按5日平均，填充的 NaN 不计入）
+        if batch.volumes.shape[1]:
+            last_volumes = batch.volumes[:, -1]
+            volume_mean5 = np.nansum(batch.volumes[:, -6:-1], axis=1) / 5
+            volume_codes = np.select(
+                [last_volumes > volume_mean5 * 1.2, last_volumes < volume_mean5 * 0.8], [0, 1], default=2
+            )
+        else:
+            volume_codes = np.full(len(batch.codes), 2)
+        
+        for i, code in enumerate(batch.codes):
+            data = index_data[code]
+            trend, strength = _TREND_LABELS[trend_codes[i]]
             
             # 计算趋势持续性
-            trend_consistency = self._calculate_trend_consistency(prices)
+            trend_consistency = self._calculate_trend_consistency(data["prices"])
             
             results[code] = {
-                "name": data["name"],
+                "name": batch.names[i],
                 "trend": trend,
                 "strength": strength,
                 "consistency": trend_consistency,
                 "change_percent": data["summary"]["change_percent"],
                 "technical_signals": {
-                    "ma_cross": self._check_ma_cross(ma5, ma10),
-                    "price_position": "站上所有均线" if prices[-1] > ma20[-1] else "站上短期均线" if prices[-1] > ma5[-1] else "跌破所有均线",
-                    "volume_trend": "放量" if data["volumes"][-1] > sum(data["volumes"][-6:-1]) / 5 * 1.2 else "缩量" if data["volumes"][-1] < sum(data["volumes"][-6:-1]) / 5 * 0.8 else "平稳"
+                    "ma_cross": self._check_ma_cross(data["technical_indicators"]["ma5"], data["technical_indicators"]["ma10"]),
+                    "price_position": _PRICE_POSITION_LABELS[position_codes[i]],
+                    "volume_trend": _VOLUME_TREND_LABELS[volume_codes[i]]
                 }
             }
         
@@ -405,11 +683,13 @@ class MarketIndexTool(BaseTool):
         # 模拟个股数据
         stock_data = self._generate_single_index_data(f"股票{stock_code}", "daily", len(index_data[list(index_data.keys())[0]]["prices"]))
         
+        # 计算各指数与个股的相关系数
+        correlations = self._calculate_correlations(
+            [data["prices"] for data in index_data.values()], stock_data["prices"]
+        )
+        
         results = {}
-        for code, data in index_data.items():
-            # 计算相关系数
-            correlation = self._calculate_correlation(data["prices"], stock_data["prices"])
-            
+        for (code, data), correlation in zip(index_data.items(), correlations):
             # 判断相关性强度
             if abs(correlation) > 0.8:
                 strength = "极强"
@@ -430,7 +710,7 @@ class MarketIndexTool(BaseTool):
                 "correlation": round(correlation, 2),
                 "strength": strength,
                 "direction": direction,
-                "beta": round(random.uniform(0.5, 1.5), 2),  # 模拟Beta值
+                "beta": round(self._rng.uniform(0.5, 1.5), 2),  # 模拟Beta值
                 "impact_level": "高" if abs(correlation) > 0.7 else "中" if abs(correlation) > 0.4 else "低"
             }
         
@@ -486,14 +766,10 @@ class MarketIndexTool(BaseTool):
         if len(prices) < 5:
             return "数据不足"
         
-        # 计算最近几天的价格变化方向
-        changes = [1 if prices[i] > prices[i-1] else -1 if prices[i] < prices[i-1] else 0 
-                  for i in range(1, len(prices))]
-        
-        # 计算最近5天的变化方向一致性
-        recent_changes = changes[-5:]
-        positive_count = sum(1 for c in recent_changes if c > 0)
-        negative_count = sum(1 for c in recent_changes if c < 0)
+        # 计算最近5天的变化方向一致性（只需最后6个价格）
+        recent_changes = np.diff(np.asarray(prices[-6:], dtype=np.float64))
+        positive_count = int(np.count_nonzero(recent_changes > 0))
+        negative_count = int(np.count_nonzero(recent_changes < 0))
         
         if positive_count >= 4:
             return "持续上涨"
@@ -508,7 +784,7 @@ class MarketIndexTool(BaseTool):
     
     def _check_ma_cross(self, ma5: List[float], ma10: List[float]) -> str:
         """检查均线交叉情况"""
-        if len(ma5) < 2 or len(ma10) < 2:
+        if len(ma5) < 2 or len(ma10) < 2 or None in (ma5[-2], ma10[-2]):
             return "数据不足"
         
         # 检查最近两天的均线交叉
@@ -523,22 +799,30 @@ class MarketIndexTool(BaseTool):
         """计算两个序列的相关系数"""
         # 确保两个序列长度相同
         min_length = min(len(series1), len(series2))
-        series1 = series1[-min_length:]
-        series2 = series2[-min_length:]
-        
-        # 计算均值
-        mean1 = sum(series1) / len(series1)
-        mean2 = sum(series2) / len(series2)
+        if min_length < 2:
+            return 0
         
-        # 计算协方差和标准差
-        covariance = sum((series1[i] - mean1) * (series2[i] - mean2) for i in range(min_length))
-        std1 = (sum((x - mean1) ** 2 for x in series1)) ** 0.5
-        std2 = (sum((x - mean2) ** 2 for x in series2)) ** 0.5
+        s1 = np.asarray(series1[-min_length:], dtype=np.float64)
+        s2 = np.asarray(series2[-min_length:], dtype=np.float64)
         
-        # 计算相关系数
-        if std1 == 0 or std2 == 0:
-            return 0
-        return covariance / (std1 * std2)
+        # 任一序列为常数时相关系数无定义，返回0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = np.corrcoef(s1, s2)[0, 1]
+        return 0 if np.isnan(correlation) else float(correlation)
+    
+    def _calculate_correlations(self, series_list: List[List[float]], target: List[float]) -> List[float]:
+        """批量计算多个序列与目标序列的相关系数"""
+        # 各指数序列长度相同时，与目标序列按末尾对齐到同一长度（与逐对计算的截取方式一致），
+        # 堆叠成矩阵一次 corrcoef 得到所有相关系数；否则逐对计算
+        lengths = {len(series) for series in series_list}
+        length = min(*lengths, len(target)) if len(lengths) == 1 else 0
+        if length < 2:
+            return [self._calculate_correlation(series, target) for series in series_list]
+        
+        matrix = np.array([*(series[-length:] for series in series_list), target[-length:]], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlations = np.corrcoef(matrix)[-1, :-1]
+        return np.nan_to_num(correlations, nan=0.0).tolist()
     
     def _generate_market_overview(self, trend_results: Dict[str, Any]) -> str:
         """生成市场概览"""
@@ -562,16 +846,19 @@ class MarketIndexTool(BaseTool):
         overview = f"市场整体呈{market_trend}趋势，{up_count}个指数上涨，{down_count}个指数下跌。"
         
         # 添加主要指数表现
-        for code, data in trend_results.items():
-            if "000001.SH" in code or "399001.SZ" in code or "HSI" in code:
-                overview += f"{data['name']}呈{data['trend']}趋势，变动{data['change_percent']}%。"
+        major_indices = "".join(
+            f"{data['name']}呈{data['trend']}趋势，变动{data['change_percent']}%。"
+            for code, data in trend_results.items()
+            if "000001.SH" in code or "399001.SZ" in code or "HSI" in code
+        )
         
-        return overview
+        return overview + major_indices
     
     def _generate_correlation_summary(self, correlation_results: Dict[str, Any], stock_code: str) -> str:
         """生成相关性分析摘要"""
         # 找出相关性最强的指数
-        strongest_correlation = max(correlation_results.values(), key=lambda x: abs(x["correlation"]))
+        entries = list(correlation_results.values())
+        strongest_correlation = entries[int(np.argmax(np.abs([data["correlation"] for data in entries])))]
         
         # 生成摘要文本
         summary = f"股票{stock_code}与{strongest_correlation['name']}的相关性最强，为{strongest_correlation['correlation']}，呈{strongest_correlation['direction']}关系。"
@@ -585,68 +872,68 @@ class MarketIndexTool(BaseTool):
     
     def _generate_comprehensive_report(self, results: Dict[str, Any], stock_code: Optional[str] = None) -> str:
         """生成综合分析报告"""
-        # 生成市场整体分析
-        market_analysis = "# 大盘指数分析报告\n\n## 市场整体情况\n\n"
+        # 生成市场整体分析（各段落先收集到列表，最后一次性拼接）
+        parts = ["# 大盘指数分析报告\n\n## 市场整体情况\n\n"]
         
         # 统计上涨和下跌的指数数量
         up_indices = [data for data in results.values() if "上涨" in data["trend"]]
         down_indices = [data for data in results.values() if "下跌" in data["trend"]]
         
-        market_analysis += f"当前市场中，{len(up_indices)}个指数上涨，{len(down_indices)}个指数下跌。"
+        parts.append(f"当前市场中，{len(up_indices)}个指数上涨，{len(down_indices)}个指数下跌。")
         
         if len(up_indices) > len(down_indices):
-            market_analysis += "市场整体呈上涨趋势，投资者情绪偏向乐观。\n\n"
+            parts.append("市场整体呈上涨趋势，投资者情绪偏向乐观。\n\n")
         elif len(down_indices) > len(up_indices):
-            market_analysis += "市场整体呈下跌趋势，投资者情绪偏向谨慎。\n\n"
+            parts.append("市场整体呈下跌趋势，投资者情绪偏向谨慎。\n\n")
         else:
-            market_analysis += "市场整体呈震荡趋势，投资者情绪中性。\n\n"
+            parts.append("市场整体呈震荡趋势，投资者情绪中性。\n\n")
         
         # 添加主要指数分析
-        market_analysis += "## 主要指数分析\n\n"
+        parts.append("## 主要指数分析\n\n")
         for code, data in results.items():
-            market_analysis += f"### {data['name']}\n\n"
-            market_analysis += f"- **趋势**：{data['trend']}\n"
-            market_analysis += f"- **涨跌幅**：{data['change_percent']}%\n"
-            market_analysis += f"- **技术指标**：MA5={data['technical_indicators']['ma5'][-1]}，MA10={data['technical_indicators']['ma10'][-1]}，RSI={data['technical_indicators']['rsi']}\n\n"
+            parts.append(f"### {data['name']}\n\n")
+            parts.append(f"- **趋势**：{data['trend']}\n")
+            parts.append(f"- **涨跌幅**：{data['change_percent']}%\n")
+            parts.append(f"- **技术指标**：MA5={data['technical_indicators']['ma5'][-1]}，MA10={data['technical_indicators']['ma10'][-1]}，RSI={data['technical_indicators']['rsi']}\n\n")
         
         # 如果提供了股票代码，添加对该股票的影响分析
         if stock_code:
-            market_analysis += f"## 对{stock_code}的影响分析\n\n"
+            parts.append(f"## 对{stock_code}的影响分析\n\n")
             
-            # 找出相关性最强的指数
+            # 找出相关性最强的指数（相关系数全为0时视为没有）
             strongest_correlation = None
-            strongest_value = 0
-            
-            for code, data in results.items():
-                if "correlation" in data and abs(data["correlation"]) > strongest_value:
-                    strongest_value = abs(data["correlation"])
-                    strongest_correlation = data
+            correlated = [data for data in results.values() if "correlation" in data]
+            if correlated:
+                strengths = np.abs([data["correlation"] for data in correlated])
+                strongest_index = int(np.argmax(strengths))
+                if strengths[strongest_index] > 0:
+                    strongest_correlation = correlated[strongest_index]
             
             if strongest_correlation:
-                market_analysis += f"{stock_code}与{strongest_correlation['name']}的相关性最强，相关系数为{strongest_correlation['correlation']}。\n\n"
+                parts.append(f"{stock_code}与{strongest_correlation['name']}的相关性最强，相关系数为{strongest_correlation['correlation']}。\n\n")
                 
                 if strongest_correlation["correlation"] > 0:
-                    market_analysis += f"这表明{stock_code}与{strongest_correlation['name']}呈正相关关系，当{strongest_correlation['name']}上涨时，{stock_code}也倾向于上涨。\n\n"
+                    parts.append(f"这表明{stock_code}与{strongest_correlation['name']}呈正相关关系，当{strongest_correlation['name']}上涨时，{stock_code}也倾向于上涨。\n\n")
                 else:
-                    market_analysis += f"这表明{stock_code}与{strongest_correlation['name']}呈负相关关系，当{strongest_correlation['name']}上涨时，{stock_code}倾向于下跌。\n\n"
+                    parts.append(f"这表明{stock_code}与{strongest_correlation['name']}呈负相关关系，当{strongest_correlation['name']}上涨时，{stock_code}倾向于下跌。\n\n")
             
             # 添加投资建议
-            market_analysis += "## 投资建议\n\n"
+            parts.append("## 投资建议\n\n")
             
             # 基于市场趋势和相关性给出建议
             if len(up_indices) > len(down_indices):
                 if stock_code and strongest_correlation and strongest_correlation["correlation"] > 0:
-                    market_analysis += f"鉴于市场整体呈上涨趋势，且{stock_code}与主要指数呈正相关关系，建议关注{stock_code}的上涨机会。\n\n"
+                    parts.append(f"鉴于市场整体呈上涨趋势，且{stock_code}与主要指数呈正相关关系，建议关注{stock_code}的上涨机会。\n\n")
                 elif stock_code and strongest_correlation and strongest_correlation["correlation"] < 0:
-                    market_analysis += f"虽然市场整体呈上涨趋势，但{stock_code}与主要指数呈负相关关系，建议谨慎对待{stock_code}的投资机会。\n\n"
+                    parts.append(f"虽然市场整体呈上涨趋势，但{stock_code}与主要指数呈负相关关系，建议谨慎对待{stock_code}的投资机会。\n\n")
                 else:
-                    market_analysis += "鉴于市场整体呈上涨趋势，建议关注顺势而为的投资机会。\n\n"
+                    parts.append("鉴于市场整体呈上涨趋势，建议关注顺势而为的投资机会。\n\n")
             else:
                 if stock_code and strongest_correlation and strongest_correlation["correlation"] > 0:
-                    market_analysis += f"鉴于市场整体呈下跌趋势，且{stock_code}与主要指数呈正相关关系，建议谨慎对待{stock_code}的投资风险。\n\n"
+                    parts.append(f"鉴于市场整体呈下跌趋势，且{stock_code}与主要指数呈正相关关系，建议谨慎对待{stock_code}的投资风险。\n\n")
                 elif stock_code and strongest_correlation and strongest_correlation["correlation"] < 0:
-                    market_analysis += f"虽然市场整体呈下跌趋势，但{stock_code}与主要指数呈负相关关系，可能会有逆势表现，建议密切关注。\n\n"
+                    parts.append(f"虽然市场整体呈下跌趋势，但{stock_code}与主要指数呈负相关关系，可能会有逆势表现，建议密切关注。\n\n")
                 else:
-                    market_analysis += "鉴于市场整体呈下跌趋势，建议控制仓位，谨慎投资。\n\n"
+                    parts.append("鉴于市场整体呈下跌趋势，建议控制仓位，谨慎投资。\n\n")
         
-        return market_analysis
\ No newline at end of file
+        return "".join(parts)
\ No newline at end of file
@@ -1,3 +1,5 @@
+import itertools
+import re
 from contextlib import AsyncExitStack
 from typing import Dict, List, Optional
 
@@ -18,11 +20,24 @@ from mcp import ClientSession, StdioServerParameters
 from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
 from mcp.types import ListToolsResult, TextContent
+from src.config import config
 from src.logger import logger
 from src.tool.base import BaseTool, ToolResult
 from src.tool.tool_collection import ToolCollection
 
 
+# 断开连接时可以忽略的已知异步清理错误（匹配小写的错误信息）
+_IGNORABLE_CLEANUP_ERRORS = (
+    "cancel scope",
+    "generator didn't stop",
+    "attempted to exit cancel scope",
+    "unhandled errors in a taskgroup",
+    "asyncgen",
+    "generatorexit",
+)
+_IGNORABLE_CLEANUP_RE = re.compile("|".join(map(re.escape, _IGNORABLE_CLEANUP_ERRORS)))
+
+
 class MCPClientTool(BaseTool):
     """Represents a tool proxy that can be called on the MCP server from the client side."""
 
@@ -38,11 +53,14 @@ class MCPClientTool(BaseTool):
             )
 
         try:
-            logger.info(f"Executing tool: {self.original_name}")
+            logger.info("Executing tool: {}", self.original_name)
             result = await self.session.call_tool(self.original_name, kwargs)
-            content_str = ", ".join(
-                item.text for item in result.content if isinstance(item, TextContent)
-            )
+            content = result.content
+            # 最常见的是单个文本结果，直接返回而不做拼接
+            if len(content) == 1 and type(content[0]) is TextContent:
+                return ToolResult(output=content[0].text or "No output returned.")
+            texts = [item.text for item in content if type(item) is TextContent]
+            content_str = ", ".join(texts)
             return ToolResult(output=content_str or "No output returned.")
         except Exception as e:
             return ToolResult(error=f"Error executing tool: {str(e)}")
@@ -58,8 +76,39 @@ class MCPClients(ToolCollection):
     description: str = "MCP client tools for server interaction"
 
     def __init__(self):
+        self._tools_cache: Optional[tuple] = None
         super().__init__()  # Initialize with empty tools list
         self.name = "mcp"  # Keep name for backward compatibility
+        # server_id -> 该服务器注册的工具名，断开时只需移除对应条目
+        self._tools_by_server: Dict[str, List[str]] = {}
+        # server_id -> 连接目标（传输方式及地址/命令），用于判断重连时能否复用现有会话
+        self._server_targets: Dict[str, tuple] = {}
+        # server_id -> 最近一次 list_tools 返回的工具列表，重连或断开时失效
+        self._listed_tools: Dict[str, list] = {}
+        self._disconnect_locks: Dict[str, anyio.Lock] = {}
+
+    @property
+    def tools(self) -> tuple:
+        """Tools tuple, rebuilt from tool_map only after it has changed."""
+        if self._tools_cache is None:
+            self._tools_cache = tuple(self.tool_map.values())
+        return self._tools_cache
+
+    @tools.setter
+    def tools(self, value) -> None:
+        self._tools_cache = tuple(value)
+
+    def __iter__(self):
+        # 直接遍历 tool_map 视图，无需先生成 tools 元组
+        return iter(self.tool_map.values())
+
+    async def __aenter__(self) -> "MCPClients":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        # disconnect() 在当前任务中逐个关闭 exit stack；在建立连接的同一任务中使用 async with，
+        # 可避免跨任务或由垃圾回收关闭 exit stack 引发的异步清理错误
+        await self.disconnect()
 
     async def connect_sse(self, server_url: str, server_id: str = "") -> None:
         """Connect to an MCP server using SSE transport."""
@@ -67,9 +116,12 @@ class MCPClients(ToolCollection):
             raise ValueError("Server URL is required.")
 
         server_id = server_id or server_url
+        target = ("sse", server_url)
 
-        # Always ensure clean disconnection before new connection
+        # Reuse a live session to the same server, otherwise disconnect before reconnecting
         if server_id in self.sessions:
+            if await self._can_reuse(server_id, target):
+                return
             await self.disconnect(server_id)
 
         exit_stack = AsyncExitStack()
@@ -77,19 +129,16 @@ class MCPClients(ToolCollection):
 
         try:
             # 使用超时机制避免无限等待
-            with anyio.move_on_after(30.0) as scope:
+            with anyio.fail_after(30.0):
                 streams_context = sse_client(url=server_url)
                 streams = await exit_stack.enter_async_context(streams_context)
                 session = await exit_stack.enter_async_context(ClientSession(*streams))
                 self.sessions[server_id] = session
-                
-                if scope.cancel_called:
-                    raise TimeoutError("Connection to SSE server timed out")
-                
                 await self._initialize_and_list_tools(server_id)
+                self._server_targets[server_id] = target
         except Exception as e:
             # 如果在设置过程中出现任何错误，确保清理资源
-            logger.error(f"Error connecting to SSE server {server_id}: {e}")
+            logger.error("Error connecting to SSE server {}: {}", server_id, e)
             await self.disconnect(server_id)
             raise
 
@@ -101,9 +150,12 @@ class MCPClients(ToolCollection):
             raise ValueError("Server command is required.")
 
         server_id = server_id or command
+        target = ("stdio", command, tuple(args))
 
-        # Always ensure clean disconnection before new connection
+        # Reuse a live session to the same server, otherwise disconnect before reconnecting
         if server_id in self.sessions:
+            if await self._can_reuse(server_id, target):
+                return
             await self.disconnect(server_id)
 
         exit_stack = AsyncExitStack()
@@ -111,7 +163,7 @@ class MCPClients(ToolCollection):
 
         try:
             # 使用超时机制避免无限等待
-            with anyio.move_on_after(30.0) as scope:
+            with anyio.fail_after(30.0):
                 server_params = StdioServerParameters(command=command, args=args)
                 stdio_transport = await exit_stack.enter_async_context(
                     stdio_client(server_params)
@@ -119,27 +171,54 @@ class MCPClients(ToolCollection):
                 read, write = stdio_transport
                 session = await exit_stack.enter_async_context(ClientSession(read, write))
                 self.sessions[server_id] = session
-                
-                if scope.cancel_called:
-                    raise TimeoutError("Connection to stdio server timed out")
-                
                 await self._initialize_and_list_tools(server_id)
+                self._server_targets[server_id] = target
         except Exception as e:
             # 如果在设置过程中出现任何错误，确保清理资源
-            logger.error(f"Error connecting to stdio server {server_id}: {e}")
+            logger.error("Error connecting to stdio server {}: {}", server_id, e)
             await self.disconnect(server_id)
             raise
 
+    async def _can_reuse(self, server_id: str, target: tuple) -> bool:
+        """Check whether the existing session points at the same target and still answers a ping."""
+        if self._server_targets.get(server_id) != target:
+            return False
+        session = self.sessions.get(server_id)
+        if not session:
+            return False
+
+        alive = False
+        try:
+            with anyio.move_on_after(1.0):
+                await session.send_ping()
+                alive = True
+        except Exception as e:
+            logger.warning("Liveness check failed for server {}: {}", server_id, e)
+        return alive
+
     async def _initialize_and_list_tools(self, server_id: str) -> None:
         """Initialize session and populate tool map."""
         session = self.sessions.get(server_id)
         if not session:
             raise RuntimeError(f"Session not initialized for server {server_id}")
 
-        await session.initialize()
-        response = await session.list_tools()
+        if config.mcp_config.pipeline_init:
+            # 与 initialize 同时发出 list_tools，省去一次往返（需服务器支持）
+            response = None
+
+            async def _list_tools() -> None:
+                nonlocal response
+                response = await session.list_tools()
+
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(session.initialize)
+                tg.start_soon(_list_tools)
+        else:
+            await session.initialize()
+            response = await session.list_tools()
 
         # Create proper tool objects for each server tool
+        server_tool_names = self._tools_by_server.setdefault(server_id, [])
         for tool in response.tools:
             original_name = tool.name
             # Always prefix with server_id to ensure uniqueness
@@ -154,83 +233,127 @@ class MCPClients(ToolCollection):
                 original_name=original_name,
             )
             self.tool_map[tool_name] = server_tool
+            server_tool_names.append(tool_name)
+        self._listed_tools[server_id] = response.tools
 
-        # Update tools tuple
-        self.tools = tuple(self.tool_map.values())
-        logger.info(
-            f"Connected to server {server_id} with tools: {[tool.name for tool in response.tools]}"
+        # tools tuple is rebuilt lazily on next access
+        self._tools_cache = None
+        # 工具名列表只在日志实际输出时才生成
+        logger.opt(lazy=True).info(
+            "Connected to server {} with tools: {}",
+            lambda: server_id,
+            lambda: [tool.name for tool in response.tools],
         )
 
-    async def list_tools(self) -> ListToolsResult:
-        """List all available tools."""
-        tools_result = ListToolsResult(tools=[])
-        for session in self.sessions.values():
-            response = await session.list_tools()
-            tools_result.tools += response.tools
-        return tools_result
+    async def list_tools(self, refresh: bool = False) -> ListToolsResult:
+        """List all available tools, served from the per-server cache unless refresh is requested."""
+        server_ids = list(self.sessions.keys())
+        stale = [
+            sid for sid in server_ids if refresh or sid not in self._listed_tools
+        ]
+
+        async def _fetch(server_id: str, session: ClientSession) -> None:
+            tools = (await session.list_tools()).tools
+            if server_id in self.sessions:
+                self._listed_tools[server_id] = tools
+
+        # 并发请求各服务器，总耗时取决于最慢的服务器而非所有服务器之和
+        if stale:
+            async with anyio.create_task_group() as tg:
+                for sid in stale:
+                    tg.start_soon(_fetch, sid, self.sessions[sid])
+
+        return ListToolsResult(
+            tools=list(
+                itertools.chain.from_iterable(
+                    self._listed_tools.get(sid, ()) for sid in server_ids
+                )
+            )
+        )
 
     async def disconnect(self, server_id: str = "") -> None:
         """Disconnect from a specific MCP server or all servers if no server_id provided."""
         if server_id:
-            if server_id in self.sessions:
-                try:
-                    exit_stack = self.exit_stacks.get(server_id)
-
-                    # 先清理会话引用，减少异步关闭时的依赖
-                    session = self.sessions.pop(server_id, None)
-                    
-                    # 关闭 exit stack 前先尝试关闭会话
-                    if session:
-                        try:
-                            # 尝试优雅地关闭会话
-                            await session.shutdown()
-                        except Exception as e:
-                            logger.warning(f"Error shutting down session for {server_id}: {e}")
-                    
-                    # 关闭 exit stack，处理所有异步清理错误
-                    if exit_stack:
-                        try:
-                            # 使用超时机制避免无限等待
-                            with anyio.move_on_after(5.0):
-                                await exit_stack.aclose()
-                        except (RuntimeError, ExceptionGroup, GeneratorExit, Exception) as e:
-                            error_str = str(e)
-                            # 处理所有已知的异步关闭错误
-                            if any(msg in error_str.lower() for msg in [
-                                "cancel scope", 
-                                "generator didn't stop", 
-                                "attempted to exit cancel scope",
-                                "unhandled errors in a taskgroup",
-                                "asyncgen",
-                                "generatorexit"
-                            ]):
-                                logger.warning(
-                                    f"Async cleanup error during disconnect from {server_id}, continuing with cleanup: {e}"
-                                )
-                            else:
-                                logger.error(f"Unexpected error during disconnect: {e}")
-                                # 不抛出异常，确保清理继续进行
-
-                    # 确保清理所有引用，即使在出现异常的情况下
-                    self.exit_stacks.pop(server_id, None)
-
-                    # 移除与此服务器关联的工具
-                    try:
-                        self.tool_map = {
-                            k: v
-                            for k, v in self.tool_map.items()
-                            if v.server_id != server_id
-                        }
-                        self.tools = tuple(self.tool_map.values())
-                        logger.info(f"Disconnected from MCP server {server_id}")
-                    except Exception as e:
-                        logger.error(f"Error cleaning up tools for server {server_id}: {e}")
-                except Exception as e:
-                    logger.error(f"Error disconnecting from server {server_id}: {e}")
+            await self._disconnect_one(server_id)
         else:
-            # Disconnect from all servers in a deterministic order
-            for sid in sorted(list(self.sessions.keys())):
-                await self.disconnect(sid)
+            server_ids = sorted(self.sessions.keys())
+            # 并发请求各会话优雅关闭（失败只记录日志，不会取消其他会话）
+            async with anyio.create_task_group() as tg:
+                for sid in server_ids:
+                    tg.start_soon(self._shutdown_session, sid, self.sessions[sid])
+            # exit stack 中的任务组和取消作用域必须在进入它们的任务中退出，因此在当前任务中逐个关闭
+            for sid in server_ids:
+                await self._disconnect_one(sid, shutdown_session=False)
             self.tool_map = {}
-            self.tools = tuple()
+            self._tools_by_server = {}
+            self._listed_tools = {}
+            self._tools_cache = None
             logger.info("Disconnected from all MCP servers")
+
+    async def _shutdown_session(self, server_id: str, session: ClientSession) -> None:
+        """Ask a session to shut down gracefully, logging rather than raising errors."""
+        try:
+            await session.shutdown()
+        except Exception as e:
+            logger.warning("Error shutting down session for {}: {}", server_id, e)
+
+    async def _disconnect_one(self, server_id: str, shutdown_session: bool = True) -> None:
+        """Disconnect from a single MCP server, logging rather than raising errors.
+
+        shutdown_session=False skips the graceful session shutdown, for callers that already did it.
+        """
+        if server_id not in self.sessions and server_id not in self._disconnect_locks:
+            return
+
+        # 同一服务器的断开操作串行执行，后到的调用发现会话已移除后直接返回
+        lock = self._disconnect_locks.setdefault(server_id, anyio.Lock())
+        async with lock:
+            if server_id not in self.sessions:
+                return
+            try:
+                exit_stack = self.exit_stacks.get(server_id)
+
+                # 先清理会话引用，减少异步关闭时的依赖
+                session = self.sessions.pop(server_id, None)
+            
+                # 关闭 exit stack 前先尝试优雅地关闭会话
+                if session and shutdown_session:
+                    await self._shutdown_session(server_id, session)
+            
+                # 关闭 exit stack，处理所有异步清理错误
+                if exit_stack:
+                    try:
+                        # 使用超时机制避免无限等待
+                        with anyio.move_on_after(5.0):
+                            await exit_stack.aclose()
+                    except (RuntimeError, ExceptionGroup, GeneratorExit, Exception) as e:
+                        error_str = str(e)
+                        # 处理所有已知的异步关闭错误
+                        if _IGNORABLE_CLEANUP_RE.search(error_str.lower()):
+                            logger.warning(
+                                "Async cleanup error during disconnect from {}, continuing with cleanup: {}",
+                                server_id,
+                                e,
+                            )
+                        else:
+                            logger.error("Unexpected error during disconnect: {}", e)
+                            # 不抛出异常，确保清理继续进行
+
+                # 确保清理所有引用，即使在出现异常的情况下
+                self.exit_stacks.pop(server_id, None)
+                self._server_targets.pop(server_id, None)
+                self._listed_tools.pop(server_id, None)
+
+                # 移除与此服务器关联的工具
+                try:
+                    for tool_name in self._tools_by_server.pop(server_id, ()):
+                        self.tool_map.pop(tool_name, None)
+                    self._tools_cache = None
+                    logger.info("Disconnected from MCP server {}", server_id)
+                except Exception as e:
+                    logger.error("Error cleaning up tools for server {}: {}", server_id, e)
+            except Exception as e:
+                logger.error("Error disconnecting from server {}: {}", server_id, e)
+
+        if self._disconnect_locks.get(server_id) is lock:
+            del self._disconnect_locks[server_id]
@@ -54,8 +54,8 @@ class StockInfoRequest(BaseTool):
                 # Get current trading day
                 trading_day = get_recent_trading_day()
 
-                # Fetch stock information
-                data = ef.stock.get_base_info(stock_code)
+                # Fetch stock information in a worker thread to keep the event loop free
+                data = await asyncio.to_thread(ef.stock.get_base_info, stock_code)
 
                 # Convert data to dict format based on its type
                 basic_info = self._format_data(data)
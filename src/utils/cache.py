@@ -0,0 +1,110 @@
+"""
+进程内TTL缓存
+用于在短时间内复用行情接口的返回结果，避免多个智能体对同一数据重复发起网络请求；
+同一参数的并发调用会合并为一次实际请求（single-flight）
+"""
+
+import copy
+import functools
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def _make_key(args: tuple, kwargs: dict) -> str:
+    """根据调用参数生成缓存键（兼容列表等不可哈希参数）"""
+    return json.dumps([args, kwargs], sort_keys=True, default=str, ensure_ascii=False)
+
+
+class _InFlight:
+    """正在执行中的一次调用，供并发的相同调用等待并共享结果"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def ttl_cache(
+    seconds: float,
+    maxsize: int = 256,
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    copy_result: bool = True,
+):
+    """
+    带过期时间的同步函数结果缓存装饰器，线程安全
+
+    缓存未命中时，相同参数的并发调用只有第一个会真正执行函数，
+    其余调用等待其完成并直接复用结果（包括异常和不写入缓存的结果）
+
+    每个调用方默认拿到结果的独立深拷贝，修改返回值不会影响缓存和其他调用方
+
+    Args:
+        seconds: 缓存有效期（秒）
+        maxsize: 最多缓存的条目数，超出时淘汰最早写入的条目
+        cache_if: 可选的判断函数，返回False的结果不写入缓存（如失败结果）
+        copy_result: 是否向调用方返回深拷贝；结果很大且调用方保证只读时可设为False以省去拷贝
+
+    Returns:
+        装饰器，被装饰函数额外提供 cache_clear() 方法
+    """
+
+    def decorator(func):
+        share = copy.deepcopy if copy_result else (lambda value: value)
+        entries: Dict[str, Tuple[float, Any]] = {}
+        in_flight: Dict[str, _InFlight] = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs)
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(key)
+                if entry is not None and entry[0] > now:
+                    return share(entry[1])
+                call = in_flight.get(key)
+                leader = call is None
+                if leader:
+                    call = in_flight[key] = _InFlight()
+
+            if not leader:
+                call.done.wait()
+                if call.error is not None:
+                    raise call.error
+                return share(call.value)
+
+            try:
+                value = func(*args, **kwargs)
+                call.value = value
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                store = call.error is None
+                if store and cache_if is not None:
+                    try:
+                        store = cache_if(call.value)
+                    except Exception:
+                        # 判断函数出错时不写入缓存，且不能阻塞等待中的调用
+                        store = False
+                with lock:
+                    if store:
+                        if key not in entries and len(entries) >= maxsize:
+                            entries.pop(next(iter(entries)))
+                        entries[key] = (time.monotonic() + seconds, call.value)
+                    in_flight.pop(key, None)
+                call.done.set()
+            return share(value)
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
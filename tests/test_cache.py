@@ -0,0 +1,67 @@
+import threading
+import unittest
+
+from src.utils.cache import ttl_cache
+
+
+class TtlCacheTest(unittest.TestCase):
+    def test_caller_mutation_does_not_leak(self):
+        calls = []
+
+        @ttl_cache(seconds=60)
+        def fetch(code):
+            calls.append(code)
+            return {"success": True, "data": [1, 2, 3]}
+
+        first = fetch("000001")
+        first["data"].append(4)
+        first["success"] = False
+
+        second = fetch("000001")
+        self.assertEqual(second, {"success": True, "data": [1, 2, 3]})
+        self.assertEqual(calls, ["000001"])
+
+        second["data"].clear()
+        self.assertEqual(fetch("000001")["data"], [1, 2, 3])
+
+    def test_single_flight_followers_get_independent_copies(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        @ttl_cache(seconds=60)
+        def fetch():
+            started.set()
+            release.wait(5)
+            return {"data": [1]}
+
+        results = []
+
+        def worker():
+            value = fetch()
+            value["data"].append(len(results))
+            results.append(value)
+
+        leader = threading.Thread(target=worker)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len({id(value) for value in results}), 4)
+        self.assertEqual(fetch(), {"data": [1]})
+
+    def test_copy_result_false_shares_the_cached_object(self):
+        @ttl_cache(seconds=60, copy_result=False)
+        def fetch():
+            return {"data": [1]}
+
+        self.assertIs(fetch(), fetch())
+
+
+if __name__ == "__main__":
+    unittest.main()
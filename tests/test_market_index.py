@@ -0,0 +1,66 @@
+import unittest
+
+try:
+    from src.tool.market_index import MarketIndexTool
+except ImportError:  # numpy / pydantic 未安装
+    MarketIndexTool = None
+
+
+REALTIME_DATA = [
+    {"代码": "000001", "名称": "上证指数", "最新": 3120.5, "涨幅": 0.6, "成交额": 4.1e11, "昨收": 3101.9, "时间": "2024-05-10 15:00:00"},
+    {"代码": "399006", "名称": "创业板指", "最新": 1890.2, "涨幅": -0.3, "成交额": 1.6e11, "昨收": 1895.9, "时间": "2024-05-10 15:00:00"},
+]
+
+HISTORY_DATA = [
+    {"代码": "000001", "日期": f"2024-04-{day:02d}", "收盘": 3000 + day * 5, "成交额": 3.5e11 + day * 1e9}
+    for day in range(1, 26)
+] + [
+    # 创业板指只有3天历史，短于MA20的窗口
+    {"代码": "399006", "日期": f"2024-05-{day:02d}", "收盘": 1880 + day, "成交额": 1.5e11}
+    for day in (7, 8, 9)
+]
+
+
+@unittest.skipIf(MarketIndexTool is None, "numpy/pydantic not installed")
+class ProcessIndexDataTest(unittest.TestCase):
+    def setUp(self):
+        self._config_cache = MarketIndexTool._config_cache
+        MarketIndexTool._config_cache = {"enabled": False, "mcpServers": {}}
+        self.tool = MarketIndexTool(seed=0)
+
+    def tearDown(self):
+        MarketIndexTool._config_cache = self._config_cache
+
+    def test_processed_data_packs_and_analyzes(self):
+        index_data = self.tool._process_index_data(REALTIME_DATA, HISTORY_DATA)
+
+        sh = index_data["000001"]
+        self.assertEqual(len(sh["prices"]), 26)
+        self.assertEqual(sh["prices"][-1], 3120.5)
+        self.assertEqual(len(sh["volumes"]), len(sh["prices"]))
+        self.assertEqual(len(sh["technical_indicators"]["ma20"]), len(sh["prices"]))
+        self.assertEqual(sh["summary"]["end_price"], 3120.5)
+
+        batch = self.tool._pack_index_data(index_data)
+        self.assertEqual(batch.codes, ["000001", "399006"])
+        self.assertEqual(batch.prices.shape, (2, 26))
+        self.assertEqual(list(batch.last_prices), [3120.5, 1890.2])
+        # 较短的创业板指不应截短上证指数的序列
+        ma20 = self.tool._latest_moving_average(batch.prices, 20)
+        self.assertEqual(ma20[0], sh["technical_indicators"]["ma20"][-1])
+        self.assertTrue(ma20[1] != ma20[1])  # NaN
+
+        result = self.tool._analyze_comprehensive(index_data)
+        self.assertEqual(set(result["results"]), {"000001", "399006"})
+        self.assertIn("上证指数", result["comprehensive_report"])
+
+    def test_history_without_close_uses_prev_close(self):
+        history = [{"日期": "2024-05-09", "成交额": 9.5e11}]
+        index_data = self.tool._process_index_data(REALTIME_DATA[:1], history, "000001")
+
+        self.assertEqual(index_data["000001"]["prices"], [3101.9, 3120.5])
+        self.tool._analyze_trend(index_data)
+
+
+if __name__ == "__main__":
+    unittest.main()
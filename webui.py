@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import hashlib
+import heapq
 import json
 import re
 import sys
 import time
+from collections import deque
+from itertools import islice
+from string import Template
 from typing import Any, Dict, List, Optional, Tuple
 
 import streamlit as st
@@ -18,6 +23,50 @@ from rich.theme import Theme
 
 from src.config import config
 
+# markdown代码块（```lang\n...```）
+_CODE_BLOCK_RE = re.compile(r"```(\w*)\n(.*?)```", re.DOTALL)
+# 日志类型对应的前缀
+_LOG_TYPE_PREFIX = {
+    "info": "[INFO] ",
+    "success": "[SUCCESS] ",
+    "error": "[ERROR] ",
+    "debug": "[DEBUG] ",
+}
+# HTML标签（可能跨越多行）及标签内的空白
+_HTML_TAG_RE = re.compile(r"<[^<>]*>")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 日志缓冲区容量，超出后自动丢弃最早的条目
+_LOG_MESSAGES_MAXLEN = 200
+_CONSOLE_OUTPUT_MAXLEN = 500
+
+
+def _tail(items, n: int) -> list:
+    """取deque末尾的n个元素（deque不支持负数切片）"""
+    return list(islice(items, max(0, len(items) - n), None))
+
+
+def _vote_percentages(bull_cnt: int, bear_cnt: int) -> Tuple[float, float]:
+    """按整数运算计算看涨/看跌比例（保留一位小数），两者之和恰好为100"""
+    total = bull_cnt + bear_cnt
+    if total <= 0:
+        return 0.0, 0.0
+    bull_tenths = (bull_cnt * 2000 // total + 1) // 2  # 以0.1%为单位四舍五入
+    return bull_tenths / 10, (1000 - bull_tenths) / 10
+
+# 同一秒内的日志复用已格式化的时间戳: [秒, "HH:MM:SS"]
+_ts_cache = [0, ""]
+
+
+def _now_hms() -> str:
+    """返回当前时间的HH:MM:SS字符串，每秒只格式化一次"""
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache[0] = now
+        _ts_cache[1] = time.strftime("%H:%M:%S", time.localtime(now))
+    return _ts_cache[1]
+
+
 class RichLogRenderer:
     """使用Rich库格式化日志文本"""
     
@@ -33,8 +82,9 @@ class RichLogRenderer:
             if not isinstance(message, str):
                 message = str(message)
             
-            # 处理ANSI转义序列
-            message = self.ansi_escape.sub('', message)
+            # 处理ANSI转义序列（不含ESC字符时无需调用正则）
+            if '\x1b' in message:
+                message = self.ansi_escape.sub('', message)
             
             # 处理markdown代码块中的内容
             def process_code_block(match):
@@ -43,62 +93,116 @@ class RichLogRenderer:
                 
                 # 仅处理代码块中的HTML内容
                 if '<' in code_content and '>' in code_content:
-                    # 处理多行HTML内容 - 合并被分割的HTML标签
-                    lines = code_content.splitlines()
-                    merged_lines = []
-                    in_html_tag = False
-                    current_tag = ""
-                    
-                    for line in lines:
-                        stripped = line.strip()
-                        if "<" in stripped and ">" not in stripped:
-                            # 开始HTML标签
-                            in_html_tag = True
-                            current_tag += stripped
-                        elif in_html_tag and ">" in stripped:
-                            # 结束HTML标签
-                            current_tag += " " + stripped
-                            merged_lines.append(current_tag)
-                            in_html_tag = False
-                            current_tag = ""
-                        elif in_html_tag:
-                            # HTML标签中间部分
-                            current_tag += " " + stripped
-                        else:
-                            # 普通代码内容
-                            merged_lines.append(stripped)
-                    
-                    # 重新组合处理后的代码内容
-                    code_content = "\n".join(merged_lines)
+                    # 处理多行HTML内容 - 合并被分割的HTML标签（标签内的换行和空白压缩为单个空格）
+                    code_content = "\n".join(line.strip() for line in code_content.splitlines())
+                    code_content = _HTML_TAG_RE.sub(
+                        lambda tag: _WHITESPACE_RE.sub(" ", tag.group(0)), code_content
+                    )
                     # 转义HTML标签
                     code_content = code_content.replace("<", "&lt;").replace(">", "&gt;")
                 
                 return f"```{code_type}\n{code_content}\n```"
             
-            # 处理markdown代码块
-            if "```" in message:
-                message = re.sub(r"```(\w*)\n(.*?)```", 
-                            process_code_block,
-                            message, 
-                            flags=re.DOTALL)
+            # 处理markdown代码块（至少有一对```才可能构成代码块）
+            if message.count("```") >= 2:
+                message = _CODE_BLOCK_RE.sub(process_code_block, message)
             
             # 简单添加类型前缀
-            if log_type == "info":
-                return f"[INFO] {message}"
-            elif log_type == "success":
-                return f"[SUCCESS] {message}"
-            elif log_type == "error":
-                return f"[ERROR] {message}"
-            elif log_type == "debug":
-                return f"[DEBUG] {message}"
-            return message
+            return _LOG_TYPE_PREFIX.get(log_type, "") + message
         except Exception as e:
             return f"{str(message)} (渲染错误: {str(e)})"
 
+
 from main import EnhancedFinGeniusAnalyzer
 
+# HTML报告模板（样式固定，只替换$变量）
+_REPORT_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$stock_code 分析报告</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; max-width: 1000px; margin: 0 auto; padding: 20px; }
+        h1, h2, h3 { color: #2c3e50; }
+        .header { display: flex; justify-content: space-between; align-items: center; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
+        .vote-summary { background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0; }
+        .vote-metrics { display: flex; justify-content: space-around; text-align: center; }
+        .bullish { color: #27ae60; }
+        .bearish { color: #e74c3c; }
+        .research-section { margin-bottom: 20px; padding: 15px; background: #f8f9fa; border-radius: 5px; }
+        .debate-message, .highlight { margin: 10px 0; padding: 10px; background: #fff; border-left: 3px solid #3498db; }
+        .final-decision { font-size: 1.2em; font-weight: bold; margin: 15px 0; }
+        .timestamp { color: #7f8c8d; font-size: 0.9em; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>$stock_code 股票分析报告</h1>
+        <div class="timestamp">生成时间: $timestamp</div>
+    </div>
+    
+    <div class="vote-summary">
+        <h2>专家投票结果</h2>
+        <div class="final-decision">
+            最终结论: $final_decision
+        </div>
+        <div class="vote-metrics">
+            <div class="bullish">
+                <div>看涨比例</div>
+                <div>$bull_pct% ($bull_cnt票)</div>
+            </div>
+            <div class="bearish">
+                <div>看跌比例</div>
+                <div>$bear_pct% ($bear_cnt票)</div>
+            </div>
+        </div>
+    </div>
+    
+    <h2>专家辩论</h2>
+    $debate_history
+    $battle_highlights
+
+    <h2>研究分析结果</h2>
+    $research_sections
+    
+    <div class="timestamp" style="margin-top: 30px;">
+        分析耗时: $analysis_time秒 | 
+        工具调用: $total_tool_calls次 | 
+        LLM调用: $total_llm_calls次
+    </div>
+    
+    <div style="margin-top: 20px; font-size: 0.8em; color: #95a5a6; border-top: 1px solid #eee; padding-top: 10px;">
+        免责声明: 本报告由AI生成，仅供参考，不构成投资建议
+    </div>
+</body>
+</html>""")
+
+# 缓存的报告正文中生成时间的占位符（位于报告头部，先于任何分析内容出现）
+_TIMESTAMP_PLACEHOLDER = "<!--timestamp-->"
+
+
 def generate_html_report(results: Dict[str, Any]) -> str:
-    """根据分析结果生成HTML报告，匹配main.py中的报告结构"""
+    """根据分析结果生成HTML报告，匹配main.py中的报告结构（相同结果在页面重跑时复用缓存的正文）"""
+    try:
+        payload = json.dumps(results, sort_keys=True, default=str, ensure_ascii=False)
+    except (TypeError, ValueError):
+        # 结果无法序列化（如键类型混杂、循环引用）时不使用缓存
+        body = _render_report_body(results)
+    else:
+        digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+        body = _cached_report_body(digest, results)
+    return body.replace(_TIMESTAMP_PLACEHOLDER, time.strftime("%Y-%m-%d %H:%M:%S"), 1)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _cached_report_body(digest: str, _results: Dict[str, Any]) -> str:
+    """按结果摘要缓存报告正文；以下划线开头的参数不参与Streamlit的哈希"""
+    return _render_report_body(_results)
+
+
+def _render_report_body(results: Dict[str, Any]) -> str:
+    """渲染不含生成时间的报告正文"""
     stock_code = results.get("stock_code", "未知股票")
     battle_result = results.get("battle_result", {})
     research_results = {k: v for k, v in results.items() 
@@ -110,22 +214,11 @@ def generate_html_report(results: Dict[str, Any]) -> str:
         vote_count = {}
     
     # 确保获取正确的投票数值
-    bull_cnt = int(vote_count.get("bullish", 0))
-    bear_cnt = int(vote_count.get("bearish", 0))
-    total_votes = bull_cnt + bear_cnt
-    
-    # 处理除零情况和无效数据
-    if total_votes > 0:
-        bull_pct = round(bull_cnt / total_votes * 100, 1)
-        bear_pct = round(bear_cnt / total_votes * 100, 1)
-    else:
-        bull_pct = bear_pct = 0.0
+    bull_cnt = int(vote_count.get("bullish", 0) or 0)
+    bear_cnt = int(vote_count.get("bearish", 0) or 0)
+    if bull_cnt + bear_cnt <= 0:
         bull_cnt = bear_cnt = 0
-    
-    # 确保比例总和为100%
-    if total_votes > 0 and (bull_pct + bear_pct) != 100:
-        diff = 100 - (bull_pct + bear_pct)
-        bull_pct += diff  # 将差值加到看涨比例上
+    bull_pct, bear_pct = _vote_percentages(bull_cnt, bear_cnt)
     
     # 生成研究结果部分
     research_sections = []
@@ -145,92 +238,46 @@ def generate_html_report(results: Dict[str, Any]) -> str:
     # 生成辩论历史部分
     debate_history = ""
     if battle_result.get("debate_history"):
-        debate_history = "<div class='debate-history'><h3>辩论历史</h3><ul>"
-        for msg in battle_result["debate_history"]:
-            debate_history += f"""
+        parts = ["<div class='debate-history'><h3>辩论历史</h3><ul>"]
+        parts.extend(f"""
             <li class="debate-message">
                 <strong>{msg.get('agent', '未知专家')}:</strong>
                 <span>{msg.get('content', '')}</span>
             </li>
-            """
-        debate_history += "</ul></div>"
+            """ for msg in battle_result["debate_history"])
+        parts.append("</ul></div>")
+        debate_history = "".join(parts)
     
     # 生成关键辩论点
     battle_highlights = ""
     if battle_result.get("battle_highlights"):
-        battle_highlights = "<div class='battle-highlights'><h3>关键辩论点</h3><ul>"
-        for highlight in battle_result["battle_highlights"]:
-            battle_highlights += f"""
+        parts = ["<div class='battle-highlights'><h3>关键辩论点</h3><ul>"]
+        parts.extend(f"""
             <li class="highlight">
                 <strong>{highlight.get('agent', '未知专家')}:</strong>
                 <span>{highlight.get('point', '')}</span>
             </li>
-            """
-        battle_highlights += "</ul></div>"
+            """ for highlight in battle_result["battle_highlights"])
+        parts.append("</ul></div>")
+        battle_highlights = "".join(parts)
     
-    html = f"""<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{stock_code} 分析报告</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 1000px; margin: 0 auto; padding: 20px; }}
-        h1, h2, h3 {{ color: #2c3e50; }}
-        .header {{ display: flex; justify-content: space-between; align-items: center; border-bottom: 2px solid #3498db; padding-bottom: 10px; }}
-        .vote-summary {{ background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0; }}
-        .vote-metrics {{ display: flex; justify-content: space-around; text-align: center; }}
-        .bullish {{ color: #27ae60; }}
-        .bearish {{ color: #e74c3c; }}
-        .research-section {{ margin-bottom: 20px; padding: 15px; background: #f8f9fa; border-radius: 5px; }}
-        .debate-message, .highlight {{ margin: 10px 0; padding: 10px; background: #fff; border-left: 3px solid #3498db; }}
-        .final-decision {{ font-size: 1.2em; font-weight: bold; margin: 15px 0; }}
-        .timestamp {{ color: #7f8c8d; font-size: 0.9em; }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>{stock_code} 股票分析报告</h1>
-        <div class="timestamp">生成时间: {time.strftime("%Y-%m-%d %H:%M:%S")}</div>
-    </div>
-    
-    <div class="vote-summary">
-        <h2>专家投票结果</h2>
-        <div class="final-decision">
-            最终结论: {'看涨' if battle_result.get('final_decision') == 'bullish' else '看跌' if battle_result.get('final_decision') == 'bearish' else '持平'}
-        </div>
-        <div class="vote-metrics">
-            <div class="bullish">
-                <div>看涨比例</div>
-                <div>{bull_pct}% ({bull_cnt}票)</div>
-            </div>
-            <div class="bearish">
-                <div>看跌比例</div>
-                <div>{bear_pct}% ({bear_cnt}票)</div>
-            </div>
-        </div>
-    </div>
-    
-    <h2>专家辩论</h2>
-    {debate_history}
-    {battle_highlights}
+    final_decision = battle_result.get("final_decision")
+    return _REPORT_TEMPLATE.substitute(
+        stock_code=stock_code,
+        timestamp=_TIMESTAMP_PLACEHOLDER,
+        final_decision='看涨' if final_decision == 'bullish' else '看跌' if final_decision == 'bearish' else '持平',
+        bull_pct=bull_pct,
+        bull_cnt=bull_cnt,
+        bear_pct=bear_pct,
+        bear_cnt=bear_cnt,
+        debate_history=debate_history,
+        battle_highlights=battle_highlights,
+        research_sections=''.join(research_sections),
+        analysis_time=f"{results.get('analysis_time', 0):.2f}",
+        total_tool_calls=results.get('total_tool_calls', 0),
+        total_llm_calls=results.get('total_llm_calls', 0),
+    )
 
-    <h2>研究分析结果</h2>
-    {''.join(research_sections)}
-    
-    <div class="timestamp" style="margin-top: 30px;">
-        分析耗时: {results.get('analysis_time', 0):.2f}秒 | 
-        工具调用: {results.get('total_tool_calls', 0)}次 | 
-        LLM调用: {results.get('total_llm_calls', 0)}次
-    </div>
-    
-    <div style="margin-top: 20px; font-size: 0.8em; color: #95a5a6; border-top: 1px solid #eee; padding-top: 10px;">
-        免责声明: 本报告由AI生成，仅供参考，不构成投资建议
-    </div>
-</body>
-</html>"""
-    
-    return html
 
 # 全局状态管理类
 class AppState:
@@ -243,6 +290,26 @@ class AppState:
         self.error_message = None  # 错误信息
         self.analysis_task = None  # 分析任务对象
         self.should_stop = False  # 是否应该停止分析
+        self.stop_event = None  # 分析运行期间的停止事件
+        self.event_loop = None  # 分析任务所在的事件循环
+
+    def reset_stop(self):
+        """清除上一次分析遗留的停止请求，在开始新的分析前调用"""
+        self.should_stop = False
+        self.stop_event = None
+        self.event_loop = None
+
+    def request_stop(self):
+        """请求停止分析，并立即唤醒正在等待停止事件的分析任务（可在其他线程中调用）"""
+        self.should_stop = True
+        loop, event = self.event_loop, self.stop_event
+        if loop is not None and event is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭，分析已经结束
+                pass
+
 
 # 初始化Streamlit应用
 def init_app():
@@ -257,9 +324,9 @@ def init_app():
     if 'app_state' not in st.session_state:
         st.session_state.app_state = AppState()
     if 'log_messages' not in st.session_state:
-        st.session_state.log_messages = []
+        st.session_state.log_messages = deque(maxlen=_LOG_MESSAGES_MAXLEN)
     if 'console_output' not in st.session_state:
-        st.session_state.console_output = []
+        st.session_state.console_output = deque(maxlen=_CONSOLE_OUTPUT_MAXLEN)
 
     # 加载配置文件
     try:
@@ -268,6 +335,7 @@ def init_app():
         st.error(f"配置加载失败: {str(e)}")
         st.stop()
 
+
 # 显示应用标题和描述
 def show_header():
     st.title("📈 FinGenius - AI金融分析系统")
@@ -277,6 +345,7 @@ def show_header():
     """)
     st.divider()
 
+
 # 显示用户输入区域
 def show_input_area():
     st.subheader("分析参数设置")
@@ -323,6 +392,7 @@ def show_input_area():
         "debate_rounds": debate_rounds
     }
 
+
 def set_expander_height(expander_label, height_px=200):
     """
     设置指定标签的expander的最大高度，并添加滚动控制功能
@@ -430,8 +500,13 @@ def set_expander_height(expander_label, height_px=200):
             }}, 200);
         }});
         
-        // 自动滚动函数
+        // 自动滚动函数（跟随屏幕刷新执行，页面不可见时停止）
+        let scrollLoopActive = false;
         function autoScrollToBottom() {{
+            if (document.visibilityState !== 'visible') {{
+                scrollLoopActive = false;
+                return;
+            }}
             if (autoScrollEnabled && !userScrolled && expander) {{
                 const currentScrollHeight = expander.scrollHeight;
                 // 只有内容高度变化时才滚动
@@ -440,11 +515,25 @@ def set_expander_height(expander_label, height_px=200):
                     lastScrollHeight = currentScrollHeight;
                 }}
             }}
-            setTimeout(autoScrollToBottom, 100); // 更频繁的检查
+            requestAnimationFrame(autoScrollToBottom);
         }}
         
+        function startAutoScroll() {{
+            if (!scrollLoopActive) {{
+                scrollLoopActive = true;
+                requestAnimationFrame(autoScrollToBottom);
+            }}
+        }}
+        
+        // 页面重新可见时恢复自动滚动
+        document.addEventListener('visibilitychange', function() {{
+            if (document.visibilityState === 'visible') {{
+                startAutoScroll();
+            }}
+        }});
+        
         // 启动自动滚动
-        autoScrollToBottom();
+        startAutoScroll();
         
         // 添加MutationObserver监听内容变化
         const observer = new MutationObserver(() => {{
@@ -462,6 +551,11 @@ def set_expander_height(expander_label, height_px=200):
             subtree: true,
             characterData: true
         }});
+        
+        // 页面卸载时停止监听
+        window.addEventListener('beforeunload', function() {{
+            observer.disconnect();
+        }});
     }}
     
     // 确保Streamlit组件渲染完成后初始化
@@ -493,6 +587,7 @@ def set_expander_height(expander_label, height_px=200):
     # 使用markdown注入CSS和JS
     st.markdown(css_js, unsafe_allow_html=True)
 
+
 # 主函数
 def main():
     init_app()
@@ -515,7 +610,7 @@ def main():
     if 'analysis_results' not in st.session_state:
         st.session_state.analysis_results = None
     if 'console_output' not in st.session_state:
-        st.session_state.console_output = []
+        st.session_state.console_output = deque(maxlen=_CONSOLE_OUTPUT_MAXLEN)
     
     # 分析控制按钮
     col1, col2 = st.columns(2)
@@ -528,6 +623,7 @@ def main():
             st.session_state.analysis_completed = False
             st.session_state.error_message = None
             st.session_state.should_stop = False
+            st.session_state.app_state.reset_stop()
             st.session_state.analysis_running = True
             st.rerun()
     
@@ -537,6 +633,7 @@ def main():
             stop_disabled = st.session_state.analysis_completed or not st.session_state.analysis_running
             if st.button("停止分析", type="secondary", disabled=stop_disabled, key="stop_button"):
                 st.session_state.should_stop = True
+                st.session_state.app_state.request_stop()
                 st.warning("正在停止分析...")
     
     # 如果分析正在运行，执行分析
@@ -563,6 +660,7 @@ def main():
     if st.session_state.app_state.analysis_completed:
         show_analysis_results()
 
+
 async def run_analysis(params: Dict[str, Any]):
     """使用EnhancedFinGeniusAnalyzer执行实际的股票分析"""
     try:
@@ -574,11 +672,11 @@ async def run_analysis(params: Dict[str, Any]):
         # 初始化分析器
         analyzer = EnhancedFinGeniusAnalyzer()
         
-        # 添加定期检查停止请求的函数
-        async def check_stop():
-            while not st.session_state.app_state.should_stop:
-                await asyncio.sleep(0.5)
-            raise asyncio.CancelledError("分析已停止")
+        # 停止事件，由"停止分析"按钮通过 AppState.request_stop() 设置
+        app_state = st.session_state.app_state
+        stop_event = asyncio.Event()
+        app_state.stop_event = stop_event
+        app_state.event_loop = asyncio.get_running_loop()
         
         # 创建进度条和状态容器
         progress_bar = st.progress(0)
@@ -610,6 +708,12 @@ async def run_analysis(params: Dict[str, Any]):
                 self.last_update = time.time()
                 self.original_stdout = sys.stdout
                 self.renderer = RichLogRenderer()
+                # 用于把Rich对象渲染为纯文本的控制台，只创建一次
+                self._capture_console = Console(force_terminal=False, no_color=True, width=120)
+                # 控制台日志先暂存，最多每0.25秒批量写入会话状态一次
+                self._pending = []
+                self._last_flush = 0.0
+                self._flush_handle = None  # 尚未执行的延迟刷新
                 sys.stdout = self  # 重定向标准输出
                 
             def write(self, message):
@@ -621,10 +725,8 @@ async def run_analysis(params: Dict[str, Any]):
                     # 确保message是字符串，处理Rich对象和其他非字符串类型
                     if not isinstance(message, str):
                         if hasattr(message, '__rich_console__'):
-                            from rich.console import Console
-                            console = Console()
-                            with console.capture() as capture:
-                                console.print(message)
+                            with self._capture_console.capture() as capture:
+                                self._capture_console.print(message)
                             message = capture.get()
                         elif hasattr(message, '__str__'):
                             message = str(message)
@@ -634,7 +736,7 @@ async def run_analysis(params: Dict[str, Any]):
                     # 处理可能的多行消息
                     message = message.replace('\r\n', '\n').replace('\r', '\n')
                     
-                    timestamp = time.strftime("%H:%M:%S")
+                    timestamp = _now_hms()
                     html_content = self.renderer.render_log(message)
                     
                     log_entry = {
@@ -643,11 +745,11 @@ async def run_analysis(params: Dict[str, Any]):
                         "html": html_content,
                         "type": "console"
                     }
-                    # 确保 console_output 已初始化
-                    if 'console_output' not in st.session_state:
-                        st.session_state.console_output = []
-                    st.session_state.console_output.append(log_entry)
-                    self._update_console_display()
+                    self._pending.append(log_entry)
+                    if time.time() - self._last_flush > 0.25:
+                        self._flush_pending()
+                    elif self._flush_handle is None:
+                        self._schedule_flush()
 
                     # 同时也输出到控制台
                     self.original_stdout.write(message)
@@ -655,7 +757,41 @@ async def run_analysis(params: Dict[str, Any]):
                     self.original_stdout.write(f"Error processing log message: {str(e)}\n")
                 
             def flush(self):
+                # Rich每次打印后都会调用flush()，这里不刷新显示，由write()的定时批量写入和结束时的drain负责
                 pass
+
+            def _schedule_flush(self):
+                """在0.25秒间隔结束时补一次刷新，避免长时间没有新输出时最后几行一直停留在暂存区"""
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    # 不在事件循环线程中（如工作线程），由下一次写入或结束时的drain负责
+                    return
+                delay = max(0.0, 0.25 - (time.time() - self._last_flush))
+                self._flush_handle = loop.call_later(delay, self._timed_flush)
+
+            def _timed_flush(self):
+                """延迟刷新的回调，在事件循环中执行"""
+                self._flush_handle = None
+                try:
+                    self._flush_pending()
+                except Exception as e:
+                    self.original_stdout.write(f"Error flushing console output: {str(e)}\n")
+
+            def _flush_pending(self):
+                """将暂存的控制台日志写入会话状态并刷新显示"""
+                if self._flush_handle is not None:
+                    self._flush_handle.cancel()
+                    self._flush_handle = None
+                self._last_flush = time.time()
+                if not self._pending:
+                    return
+                # 确保 console_output 已初始化
+                if 'console_output' not in st.session_state:
+                    st.session_state.console_output = deque(maxlen=_CONSOLE_OUTPUT_MAXLEN)
+                st.session_state.console_output.extend(self._pending)
+                self._pending.clear()
+                self._update_console_display()
         
             def show_progress_update(self, title: str, message: str = ""):
                 # 确保所有参数都是字符串
@@ -668,7 +804,7 @@ async def run_analysis(params: Dict[str, Any]):
             
             def show_debate_message(self, agent: str, message: str, message_type: str):
                 """显示专家辩论消息"""
-                timestamp = time.strftime("%H:%M:%S")
+                timestamp = _now_hms()
                 styled_message = f"[{timestamp}] [{agent}] {message}"
                 html_content = self.renderer.render_log(styled_message, message_type)
                 
@@ -679,12 +815,9 @@ async def run_analysis(params: Dict[str, Any]):
                     "html": html_content,
                     "type": message_type
                 }
+                # log_messages 为定长deque，超出容量时自动丢弃最早的消息
                 st.session_state.log_messages.append(log_entry)
             
-                # 保持日志大小合理
-                if len(st.session_state.log_messages) > 100:
-                    st.session_state.log_messages = st.session_state.log_messages[-50:]
-            
                 # 限制更新频率(每秒最多5次)
                 if time.time() - self.last_update > 0.2:
                     self._update_log_display()
@@ -698,19 +831,12 @@ async def run_analysis(params: Dict[str, Any]):
                 with st.session_state.log_container.container():
                     st.markdown('<div class="log-container">', unsafe_allow_html=True)
                     
-                    # 合并显示所有消息
-                    all_messages = []
-                    
-                    # 添加专家消息
-                    if 'log_messages' in st.session_state:
-                        all_messages.extend(st.session_state.log_messages[-15:])
-                    
-                    # 添加控制台输出
-                    if 'console_output' in st.session_state:
-                        all_messages.extend(st.session_state.console_output[-10:])
-                    
-                    # 按时间戳排序并显示
-                    all_messages.sort(key=lambda x: x['time'])
+                    # 专家消息和控制台输出各自已按时间排序，直接归并
+                    expert_messages = _tail(st.session_state.get('log_messages', ()), 15)
+                    console_messages = _tail(st.session_state.get('console_output', ()), 10)
+                    all_messages = list(
+                        heapq.merge(expert_messages, console_messages, key=lambda x: x['time'])
+                    )
                     for msg in all_messages[-25:]:  # 显示最近的25条合并消息
                         if 'html' in msg:
                             st.markdown(f'<div class="log-message">{msg["html"]}</div>', unsafe_allow_html=True)
@@ -739,7 +865,7 @@ async def run_analysis(params: Dict[str, Any]):
         visualizer = StreamlitVisualizer()
         
         # Create tasks
-        stop_check_task = asyncio.create_task(check_stop())
+        stop_check_task = asyncio.create_task(stop_event.wait())
         analysis_task = asyncio.create_task(
             analyzer.analyze_stock(
                 stock_code=params["stock_code"],
@@ -778,10 +904,13 @@ async def run_analysis(params: Dict[str, Any]):
             for task in pending:
                 task.cancel()
             stop_check_task.cancel()
+            app_state.stop_event = None
+            app_state.event_loop = None
             
-            # 恢复标准输出
+            # 先恢复标准输出，再写入剩余的控制台日志（Streamlit调用失败时也不会留下失效的重定向）
             if hasattr(visualizer, 'original_stdout'):
                 sys.stdout = visualizer.original_stdout
+            visualizer._flush_pending()
         
         # 显示完成状态
         update_progress("分析完成!", 100)
@@ -791,6 +920,7 @@ async def run_analysis(params: Dict[str, Any]):
         st.session_state.app_state.error_message = str(e)
         st.error(f"分析失败: {str(e)}")
 
+
 # 显示分析状态
 def show_analysis_status():
     if st.session_state.app_state.error_message:
@@ -802,6 +932,7 @@ def show_analysis_status():
             st.info("分析正在进行中...")
             # 这里将添加实时日志显示
 
+
 # 显示分析结果
 def show_analysis_results():
     # 显示日志容器(折叠状态)
@@ -825,25 +956,22 @@ def show_analysis_results():
                     line-height: 1.5;
                     white-space: pre-wrap;
                     word-break: break-word;
+                    /* 跳过屏幕外日志条目的布局和绘制 */
+                    content-visibility: auto;
+                    contain-intrinsic-size: auto 1.5em;
+                    contain: content;
                 }
             </style>
             """, unsafe_allow_html=True)
             
             st.markdown('<div class="log-container">', unsafe_allow_html=True)
             
-            # 合并显示所有消息
-            all_messages = []
-            
-            # 添加专家消息
-            if 'log_messages' in st.session_state:
-                all_messages.extend(st.session_state.log_messages)
-            
-            # 添加控制台输出
-            if 'console_output' in st.session_state:
-                all_messages.extend(st.session_state.console_output)
-            
-            # 按时间戳排序并显示
-            all_messages.sort(key=lambda x: x['time'])
+            # 专家消息和控制台输出各自已按时间排序，直接归并
+            all_messages = heapq.merge(
+                st.session_state.get('log_messages', ()),
+                st.session_state.get('console_output', ()),
+                key=lambda x: x['time'],
+            )
             
             # 使用RichLogRenderer渲染没有HTML内容的消息
             renderer = RichLogRenderer()
@@ -887,15 +1015,9 @@ def show_analysis_results():
     decision_text = '看涨' if final_decision == 'bullish' else '看跌' if final_decision == 'bearish' else '无明确结论'
     
     # 计算投票比例
-    bull_cnt = int(vote_count.get('bullish', 0))
-    bear_cnt = int(vote_count.get('bearish', 0))
-    total_votes = bull_cnt + bear_cnt
-    
-    if total_votes > 0:
-        bull_pct = round(bull_cnt / total_votes * 100, 1)
-        bear_pct = round(bear_cnt / total_votes * 100, 1)
-    else:
-        bull_pct = bear_pct = 0.0
+    bull_cnt = int(vote_count.get('bullish', 0) or 0)
+    bear_cnt = int(vote_count.get('bearish', 0) or 0)
+    bull_pct, bear_pct = _vote_percentages(bull_cnt, bear_cnt)
     
     # 显示最终结论
     st.metric("最终结论", decision_text)
@@ -961,6 +1083,7 @@ def show_analysis_results():
             mime="text/html"
         )
 
+
 if __name__ == "__main__":
     import threading
     import os
@@ -974,7 +1097,7 @@ if __name__ == "__main__":
     def signal_handler(signum, frame):
         print("\n应用程序正在停止...")
         if hasattr(st.session_state, 'app_state') and st.session_state.app_state.analysis_task:
-            st.session_state.app_state.should_stop = True
+            st.session_state.app_state.request_stop()
         os._exit(0)
     
     # 只在主线程中设置信号处理